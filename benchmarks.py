@@ -0,0 +1,347 @@
+# 📊 BENCHMARKI OS-CAR - bez sieci, wynik jako JSON do porównywania wersji
+#
+#   python benchmarks.py                          # pełny zestaw (1k / 10k / 100k wierszy)
+#   python benchmarks.py --quick                  # szybki przebieg (1k wierszy)
+#   python benchmarks.py --only parse,search --output bench.json
+#
+# Parsowanie mierzone na nagranych stronach wyników sprzedajemy.pl z bench_pages/*.html
+# (te same strony sprawdza tests/test_parser_parity.py). Nowe strony z sieci:
+#   python benchmarks.py --record-pages "lusterko fabia,5J0857507"
+import argparse
+import atexit
+import json
+import logging
+import os
+import platform
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGES_DIR = os.path.join(REPO_DIR, "bench_pages")
+GROUPS = ["parse", "storage", "render", "search"]
+STORAGE_MODES = ["csv", "journal", "sqlite", "arrow"]
+
+# ✅ KATALOG ROBOCZY - baza.csv, baza.db i kopie lądują poza repozytorium
+WORK_DIR = tempfile.mkdtemp(prefix="oscar-bench-")
+atexit.register(shutil.rmtree, WORK_DIR, True)
+os.chdir(WORK_DIR)
+logging.disable(logging.WARNING)
+sys.path.insert(0, REPO_DIR)
+
+import oscar_core as core  # noqa: E402
+
+# ✅ PIERWSZA KOPIA IDZIE OD RAZU, KOLEJNE NIE ZAKŁÓCAJĄ POMIARÓW
+core.BACKUP_MIN_INTERVAL = 3600
+
+
+def measure(fn, repeat, setup=None):
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return {
+        "repeat": repeat,
+        "min_ms": round(min(times), 3),
+        "median_ms": round(statistics.median(times), 3),
+        "mean_ms": round(statistics.fmean(times), 3),
+        "max_ms": round(max(times), 3),
+    }
+
+
+def result(group, name, params, stats):
+    entry = {"group": group, "name": name, "params": params, **stats}
+    print(f"  {group:8} {name:28} {json.dumps(params):40} median {stats['median_ms']:>10.3f} ms", file=sys.stderr)
+    return entry
+
+
+# 🧪 DANE SYNTETYCZNE
+def generate_page(offers, seed=0):
+    rng = random.Random(seed)
+    hrefs = [
+        "https://sprzedajemy.pl/maska-skoda-octavia-nr{}",
+        "/sprzedajemy.pl/lusterko-fabia-nr{}",
+        "httpshttps://sprzedajemy.pl/zderzak-nr{}",
+        "https//sprzedajemy.pl/lampa-tyl-nr{}",
+    ]
+    parts = ["<!DOCTYPE html><html><head><title>Wyniki</title><script>var x = 1;</script></head><body>"]
+    for i in range(offers):
+        href = rng.choice(hrefs).format(rng.randint(10 ** 7, 10 ** 8))
+        parts.append(
+            f'<article class="offer"><a href="{href}" class="offerLink"><img src="/img/{i}.jpg" alt="">'
+            f'<h2>Część {i} &amp; akcesoria</h2></a><p class="price">{rng.randint(20, 900)} zł</p>'
+            f'<p class="desc">{"opis części samochodowej " * 15}</p></article>'
+        )
+    parts.append('<a href="https://sprzedajemy.pl/regulamin">Regulamin</a></body></html>')
+    return "".join(parts)
+
+
+def load_pages():
+    pages = {}
+    if os.path.isdir(PAGES_DIR):
+        for name in sorted(os.listdir(PAGES_DIR)):
+            if name.endswith(".html"):
+                with open(os.path.join(PAGES_DIR, name), encoding="utf-8") as f:
+                    pages[name] = f.read()
+    if not pages:
+        raise SystemExit(f"❌ Brak nagranych stron w {PAGES_DIR}")
+    return pages
+
+
+def record_pages(queries):
+    # ✅ OBIE WYSZUKIWARKI (tytuł i numer) DLA KAŻDEGO ZAPYTANIA - zapis bez cache HTTP
+    os.makedirs(PAGES_DIR, exist_ok=True)
+    for query in queries:
+        for kind, url in zip(("tytul", "numer"), core.build_search_urls(core.search_base(query))):
+            html = core.http_get(url).text
+            name = f"szukaj_{re.sub(r'[^0-9A-Za-z]+', '_', query).strip('_')}_{kind}.html"
+            with open(os.path.join(PAGES_DIR, name), "w", encoding="utf-8", newline="") as f:
+                f.write(html)
+            print(f"  {name}: {len(html)} B, {len(core.extract_ids_and_links(html)[0])} ofert", file=sys.stderr)
+
+
+def write_baza(rows, path=core.CSV_PATH):
+    rng = random.Random(rows)
+    start = datetime(2020, 1, 1)
+    records = []
+    for i in range(rows):
+        kind = rng.choice(["manual", "sprzedajemypl", "allegro"])
+        part = f"5J0{rng.randint(100000, 999999)}"
+        records.append({
+            "id": f"{kind}-{part}-{1600000000 + i}",
+            "tytul": part,
+            "cena": str(rng.randint(20, 900)) if rng.random() < 0.5 else "",
+            "link": f"https://sprzedajemy.pl/czesc-nr{rng.randint(10 ** 7, 10 ** 8)}",
+            "opis": f"Konkretna oferta: {part}",
+            "status": "Sprzedana",
+            "notatka": "wysłane" if rng.random() < 0.2 else "",
+            "dodano": (start + timedelta(minutes=17 * i)).strftime(core.DODANO_FORMAT),
+        })
+    core.pd.DataFrame(records, columns=core.COLUMNS).to_csv(path, index=False, encoding="utf-8")
+    return records
+
+
+def fresh_dir(name):
+    path = os.path.join(WORK_DIR, name)
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    os.chdir(path)
+    core.invalidate_data()
+    core.get_db.clear()
+    core.get_http_cache.clear()
+    return path
+
+
+# 🔍 PARSOWANIE STRON WYNIKÓW
+def bench_parse(args):
+    results = []
+    for name, html in load_pages().items():
+        fast = core.extract_ids_and_links(html)
+        reference = core.extract_ids_and_links_bs4(html)
+        if fast != reference:
+            raise SystemExit(f"❌ Różne wyniki parserów dla {name}")
+        params = {"page": name, "bytes": len(html), "offers": len(fast[0])}
+        results.append(result("parse", "extract_ids_and_links", params,
+                              measure(lambda: core.extract_ids_and_links(html), args.repeat * 5)))
+        results.append(result("parse", "extract_ids_and_links_bs4", params,
+                              measure(lambda: core.extract_ids_and_links_bs4(html), args.repeat * 5)))
+    return results
+
+
+# 💾 ZAPIS I ODCZYT BAZY
+def bench_storage(args):
+    results = []
+    for mode in STORAGE_MODES:
+        for rows in args.sizes:
+            fresh_dir(f"storage_{mode}_{rows}")
+            records = write_baza(rows)
+            core.STORAGE_MODE = mode
+            params = {"mode": mode, "rows": rows}
+            if mode == "sqlite":
+                results.append(result("storage", "migrate_csv", params, measure(core.get_db, 1)))
+            if mode == "arrow":
+                results.append(result("storage", "migrate_csv", params, measure(core.read_arrow, 1)))
+            # ✅ PAMIĘĆ RAMKI WSPÓLNEJ (z kolumnami pochodnymi) obok czasu wczytania
+            stats = measure(core.load_data, args.repeat, setup=core.get_data_cache().clear)
+            stats["frame_mb"] = round(core.load_data().memory_usage(deep=True).sum() / 2 ** 20, 2)
+            results.append(result("storage", "load_data", params, stats))
+            # ✅ PIERWSZA STRONA PANELU SPRZEDANYCH - bez wspólnej ramki w cache
+            results.append(result("storage", "load_sorted_page", params, measure(
+                lambda: core.load_sorted("Najnowsze", limit=core.PAGE_SIZE), args.repeat, setup=core.get_data_cache().clear)))
+            df = core.read_all()
+            results.append(result("storage", "save_data", params, measure(lambda: core.save_data(df), args.repeat)))
+            buffer = core.get_write_buffer()
+            row_ids = [r["id"] for r in records]
+            counter = iter(range(10 ** 9))
+
+            def save_field():
+                buffer.add(random.choice(row_ids), "notatka", f"notatka {next(counter)}")
+                buffer.flush()
+
+            results.append(result("storage", "save_field", params, measure(save_field, args.repeat * 5)))
+
+            def edit_price():
+                buffer.add(random.choice(row_ids), "cena", str(random.randint(20, 900)))
+                buffer.flush()
+                core.load_data()
+
+            # ✅ STATYSTYKI - budowa od zera i poprawka po jednej zmianie ceny (bez wczytywania bazy)
+            results.append(result("storage", "sales_stats_build", params, measure(
+                lambda: core.sales_stats("Miesiąc"), args.repeat, setup=core.get_sales_stats.clear)))
+            results.append(result("storage", "sales_stats_update", params, measure(
+                lambda: core.sales_stats("Miesiąc"), args.repeat, setup=edit_price)))
+    core.STORAGE_MODE = "csv"
+    return results
+
+
+# 🖥️ RENDEROWANIE PANELU (Streamlit AppTest, bez przeglądarki)
+def bench_render(args):
+    from streamlit.testing.v1 import AppTest
+
+    results = []
+    for rows in args.sizes:
+        fresh_dir(f"render_{rows}")
+        write_baza(rows)
+        app = AppTest.from_file(os.path.join(REPO_DIR, "main.py"), default_timeout=600)
+        params = {"mode": "csv", "rows": rows}
+        results.append(result("render", "first_run", params, measure(app.run, 1)))
+        if app.exception:
+            raise SystemExit(f"❌ Błąd aplikacji: {app.exception[0].value}")
+        results.append(result("render", "rerun", params, measure(app.run, args.repeat)))
+    return results
+
+
+# 🌐 WYSZUKIWANIE NA LOKALNYM SERWERZE Z OPÓŹNIENIEM
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    page = b""
+    etag = ""
+    status = 200
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        if self.status != 200:
+            self.send_response(self.status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(self.page)))
+        self.send_header("ETag", self.etag)
+        self.end_headers()
+        self.wfile.write(self.page)
+
+    def log_message(self, *args):
+        pass
+
+
+def bench_search(args):
+    results = []
+    StubHandler.page = generate_page(60).encode("utf-8")
+    StubHandler.etag = f'"{len(StubHandler.page)}"'
+    fresh_dir("search")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    core.SPRZEDAJEMY_URL = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        for latency_ms in args.latencies:
+            StubHandler.latency = latency_ms / 1000
+            params = {"latency_ms": latency_ms}
+            core.HTTP_CACHE_ENABLED = False
+            results.append(result("search", "search_multiple_platforms", params,
+                                  measure(lambda: core.search_multiple_platforms("maska skoda octavia"), args.repeat)))
+            # 💽 CACHE HTTP: świeży wpis z dysku / rewalidacja zakończona 304
+            core.HTTP_CACHE_ENABLED = True
+            core.search_multiple_platforms("maska skoda octavia")
+            results.append(result("search", "http_cache_hit", params,
+                                  measure(lambda: core.search_multiple_platforms("maska skoda octavia"), args.repeat)))
+            core.HTTP_CACHE_TTL = 0
+            results.append(result("search", "http_cache_revalidate_304", params,
+                                  measure(lambda: core.search_multiple_platforms("maska skoda octavia"), args.repeat)))
+            core.HTTP_CACHE_TTL = 600
+            core.get_search_cache().invalidate()
+            core.cached_search("maska skoda octavia")
+            results.append(result("search", "cached_search_hit", params,
+                                  measure(lambda: core.cached_search("Maska  Skoda Octavia"), args.repeat * 5)))
+        # 🛡️ AWARIA SERWISU - bezpiecznik otwarty po pierwszym wyszukiwaniu, kolejne kończą się od razu
+        StubHandler.status = 503
+        core.HTTP_CACHE_ENABLED = False
+        params = {"latency_ms": args.latencies[-1], "status": 503}
+        results.append(result("search", "outage_first_search", params,
+                              measure(lambda: core.search_multiple_platforms("maska skoda octavia"), 1)))
+        results.append(result("search", "outage_circuit_open", params,
+                              measure(lambda: core.search_multiple_platforms("maska skoda octavia"), args.repeat)))
+    finally:
+        StubHandler.status = 200
+        core.HTTP_CACHE_ENABLED = True
+        core.get_circuit_breaker.clear()
+        server.shutdown()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmarki OS-CAR (bez sieci)")
+    parser.add_argument("--only", default=",".join(GROUPS), help=f"grupy oddzielone przecinkami: {', '.join(GROUPS)}")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="rozmiary bazy (wiersze)")
+    parser.add_argument("--latencies", default="0,50,200", help="opóźnienia serwera testowego (ms)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="tylko 1000 wierszy, 3 powtórzenia")
+    parser.add_argument("--output", help="plik JSON (domyślnie stdout)")
+    parser.add_argument("--record-pages", help="zapytania oddzielone przecinkami - zapisz strony wyników do bench_pages/")
+    args = parser.parse_args()
+    if args.record_pages:
+        record_pages([q.strip() for q in args.record_pages.split(",") if q.strip()])
+        return
+    args.sizes = [int(s) for s in args.sizes.split(",")]
+    args.latencies = [int(s) for s in args.latencies.split(",")]
+    if args.quick:
+        args.sizes, args.repeat = [1000], 3
+
+    benches = {"parse": bench_parse, "storage": bench_storage, "render": bench_render, "search": bench_search}
+    results = []
+    for group in args.only.split(","):
+        results.extend(benches[group.strip()](args))
+    os.chdir(WORK_DIR)
+
+    report = {
+        "revision": git_revision(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pandas": core.pd.__version__,
+        "results": results,
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main_cli()
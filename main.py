@@ -1,143 +1,34 @@
 import streamlit as st
 import pandas as pd
-import os
-import requests
-from bs4 import BeautifulSoup
 from datetime import datetime
 import webbrowser
-import re
-from urllib.parse import quote_plus
 import time
-import shutil
-
-CSV_PATH = "baza.csv"
-
-# ✅ BACKUP DANYCH
-def backup_data():
-    if os.path.exists(CSV_PATH):
-        backup_name = f"backup_baza_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
-        shutil.copy2(CSV_PATH, backup_name)
-        return backup_name
-    return None
-
-# ⚡ OPTYMALIZACJA - cache dla danych
-@st.cache_data(ttl=300)
-def load_data():
-    if not os.path.exists(CSV_PATH):
-        return pd.DataFrame(columns=["id", "tytul", "cena", "link", "opis", "status", "notatka", "dodano"])
-    df = pd.read_csv(CSV_PATH, dtype=str)
-    # ✅ USUWANIE 'nan' Z PUSTYCH PÓL
-    df = df.replace('nan', '').fillna('')
-    return df
-
-# ⚡ OPTYMALIZACJA - szybszy zapis
-def save_data(df):
-    # ✅ USUWANIE 'nan' PRZED ZAPISEM
-    df = df.replace('nan', '').fillna('')
-    df.to_csv(CSV_PATH, index=False, encoding="utf-8")
-    # ✅ TWORZENIE BACKUPU PRZY KAŻDYM ZAPISIE
-    backup_name = backup_data()
-    if backup_name:
-        st.toast(f"📂 Backup utworzony: {backup_name}", icon="✅")
-    load_data.clear()
+import uuid
+from oscar_core import (
+    ARCHIVE_KEEP_MONTHS, DUPLICATE_MODE, ENRICH_POLL_INTERVAL, PAGE_SIZE, PAGE_SIZE_OPTIONS, PROFILE_ENABLED,
+    PROFILE_LOG_PATH, PROFILE_METRICS_PATH, PROFILE_RUNS, SEARCH_POLL_INTERVAL, SORT_OPTIONS, STATS_PERIODS,
+    BackgroundSearch, archive_partitions, archived_rows, batch_lookup, build_manual_row, build_sold_row,
+    cached_search, count_rows, delete_row, enabled_providers, enqueue_enrichment, export_csv, find_duplicates,
+    get_best_offer_link, get_data_cache, get_profiler, get_write_buffer, insert_rows, last_added, list_backups,
+    list_partitions, load_sorted, parse_batch_input, prepare_storage, record_stage, restore_backup, sales_stats,
+    search_sold, start_enrichment,
+)
 
-def save_field(idx, key, column):
+def save_field(row_id, key, column, expected=None):
     value = st.session_state.get(key, "")
-    current_df = load_data()
-    current_df.at[idx, column] = value
-    save_data(current_df)
-
-def extract_ids_and_links(html):
-    soup = BeautifulSoup(html, "html.parser")
-    links = soup.select("a[href*='sprzedajemy.pl/'][href*='nr']")
-    ids, urls = [], []
-    for link in links:
-        href = link.get("href", "")
-        if "nr" in href:
-            offer_id = href.split("-")[-1].replace("nr", "")
-            clean = href.replace("httpshttps", "https").replace("https//", "https://").replace("https://sprzedajemy.plhttps://", "https://sprzedajemy.pl/")
-            full_url = "https://sprzedajemy.pl" + href if not href.startswith("https") else clean
-            ids.append(offer_id)
-            urls.append(full_url)
-    return ids, urls
-
-def analyze_search(base):
-    headers = {"User-Agent": "Mozilla/5.0"}
-    url_title = f"https://oscar.sprzedajemy.pl/szukaj?schm2=ls&catCode=6bea9f&inp_text%5Bv%5D={base}&inp_category_id=2&inp_location_id=1"
-    url_id = f"{url_title}&inp_text%5Bn%5D=1"
-
-    # ⚡ DODAJ TIMEOUT - szybsze błędy
-    try:
-        html_title = requests.get(url_title, headers=headers, timeout=8).text
-        html_id = requests.get(url_id, headers=headers, timeout=8).text
-    except requests.exceptions.Timeout:
-        return {"ids_title": [], "urls_title": [], "ids_id": [], "urls_id": [], "url_title": url_title, "url_id": url_id}
-    except Exception as e:
-        st.error(f"Błąd połączenia: {e}")
-        return {"ids_title": [], "urls_title": [], "ids_id": [], "urls_id": [], "url_title": url_title, "url_id": url_id}
-    
-    ids_title, urls_title = extract_ids_and_links(html_title)
-    ids_id, urls_id = extract_ids_and_links(html_id)
-
-    return {
-        "ids_title": ids_title,
-        "urls_title": urls_title,
-        "ids_id": ids_id,
-        "urls_id": urls_id,
-        "url_title": url_title,
-        "url_id": url_id
-    }
+    get_write_buffer().add(row_id, column, value, expected, session=st.session_state.session_id)
 
-def szukaj_allegro_parts_skoda(fraza):
-    try:
-        encoded_fraza = quote_plus(fraza)
-        allegro_url = f"https://allegro.pl/uzytkownik/PARTS_SKODA?string={encoded_fraza}"
-        
-        return {
-            "link": allegro_url,
-            "fraza": fraza,
-            "platforma": "Allegro",
-            "seller": "CZĘŚCI_SKODA"
-        }
-        
-    except Exception as e:
-        st.error(f"Błąd Allegro: {str(e)}")
-        return None
-
-def search_multiple_platforms(query):
-    results = {}
-    
-    base = query.strip().replace(" ", "+")
-    sprzedajemy_result = analyze_search(base)
-    results["sprzedajemy"] = sprzedajemy_result
-    
-    allegro_result = szukaj_allegro_parts_skoda(query)
-    results["allegro"] = allegro_result
-    
-    return results
+# ⌨️ CZEKANIE NA WYSZUKIWANIE - odświeżany tylko ten fragment, cała strona po każdym nowym wyniku dostawcy
+@st.fragment(run_every=SEARCH_POLL_INTERVAL)
+def wait_for_search():
+    if st.session_state.searcher.version != st.session_state.search_version:
+        st.rerun()
 
-def get_best_offer_link(results, query):
-    sprzedajemy_result = results["sprzedajemy"]
-    allegro_result = results["allegro"]
-    
-    ids_title, urls_title = sprzedajemy_result["ids_title"], sprzedajemy_result["urls_title"]
-    ids_id, urls_id = sprzedajemy_result["ids_id"], sprzedajemy_result["urls_id"]
-    
-    if len(ids_title) == 1:
-        return urls_title[0], "Sprzedajemy.pl", f"Konkretna oferta: {query}"
-    elif len(ids_id) == 1:
-        return urls_id[0], "Sprzedajemy.pl", f"Konkretna oferta: {query}"
-    elif len(ids_title) > 0 or len(ids_id) > 0:
-        if len(ids_title) > len(ids_id):
-            return sprzedajemy_result["url_title"], "Sprzedajemy.pl", f"Lista ofert: {query}"
-        else:
-            return sprzedajemy_result["url_id"], "Sprzedajemy.pl", f"Lista ofert: {query}"
-    elif allegro_result and allegro_result["link"]:
-        return allegro_result["link"], "Allegro", f"Wyszukiwanie Allegro: {query}"
-    else:
-        base = query.strip().replace(" ", "+")
-        result = analyze_search(base)
-        return result["url_title"], "Sprzedajemy.pl", f"Wyszukiwanie: {query}"
+# 🏷️ CENY Z OFERT W TLE - strona odświeżana, gdy kolejna oferta dostała cenę i tytuł
+@st.fragment(run_every=ENRICH_POLL_INTERVAL)
+def wait_for_enrichment(enrichment, version):
+    if enrichment.version != version:
+        st.rerun()
 
 # 🌐 KONFIGURACJA
 st.set_page_config(
@@ -146,6 +37,12 @@ st.set_page_config(
     page_icon="🚗"
 )
 
+# 🚀 MIGRACJE BAZY PRZY STARCIE - przed pierwszym odczytem z cache danych
+prepare_storage()
+
+if PROFILE_ENABLED:
+    get_profiler().start_run()
+
 # 🎨 STYL - ZAKTUALIZOWANY
 st.markdown("""
     <style>
@@ -265,6 +162,11 @@ if 'last_query' not in st.session_state:
     st.session_state.last_query = ""
 if 'link_opened' not in st.session_state:
     st.session_state.link_opened = False
+if 'searcher' not in st.session_state:
+    st.session_state.searcher = BackgroundSearch()
+# ✅ ID SESJI - edycje w buforze zapisu, ich licznik i konflikty należą do tej sesji
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 
 # ODDZIELNE STANY DLA FORMULARZA RĘCZNEGO
 if 'manual_id' not in st.session_state:
@@ -274,7 +176,62 @@ if 'manual_link' not in st.session_state:
 if 'manual_note' not in st.session_state:
     st.session_state.manual_note = ""
 
-df = load_data()
+# WYNIKI TRYBU WSADOWEGO
+if 'batch_results' not in st.session_state:
+    st.session_state.batch_results = []
+
+# WIERSZE WSTRZYMANE PRZEZ OSTRZEŻENIE O DUPLIKACIE
+if 'pending_insert' not in st.session_state:
+    st.session_state.pending_insert = None
+
+# STAN PANELU SPRZEDANYCH - STRONA I ROZWINIĘTY WIERSZ
+if 'sold_page' not in st.session_state:
+    st.session_state.sold_page = 0
+if 'expanded_row' not in st.session_state:
+    st.session_state.expanded_row = None
+
+def describe_sale(row):
+    return f"**{row.get('tytul', '')}** ({row.get('dodano') or 'ta lista'}) {row.get('link') or ''}".strip()
+
+def insert_sold_rows(rows):
+    insert_rows(rows)
+    # ✅ CENA I TYTUŁ Z OFERTY POBIERANE W TLE - kliknięcie nie czeka na stronę oferty
+    enqueue_enrichment(rows)
+
+def add_sold_rows(rows, source):
+    # ✅ DUPLIKAT - wiersze czekają na decyzję zamiast trafić do bazy
+    duplicates = [d for d in find_duplicates(rows) if d]
+    if duplicates:
+        st.session_state.pending_insert = {"rows": rows, "duplicates": duplicates, "source": source}
+        return False
+    insert_sold_rows(rows)
+    return True
+
+def duplicate_prompt(source):
+    # Zwraca True, gdy wstrzymane wiersze zostały dodane mimo ostrzeżenia
+    pending = st.session_state.pending_insert
+    if not pending or pending["source"] != source:
+        return False
+    for duplicate in pending["duplicates"]:
+        message = f"ten sam {duplicate['reason']} już sprzedany: {describe_sale(duplicate['match'])}"
+        if DUPLICATE_MODE == "block":
+            st.error(f"🚫 Nie dodano - {message}")
+        else:
+            st.warning(f"⚠️ Możliwy duplikat - {message}")
+    col_force, col_cancel = st.columns([3, 1])
+    with col_force:
+        if DUPLICATE_MODE != "block" and st.button("⚠️ DODAJ MIMO TO", use_container_width=True, key=f"dup_force_{source}"):
+            insert_sold_rows(pending["rows"])
+            st.session_state.pending_insert = None
+            return True
+    with col_cancel:
+        if st.button("✖️ Anuluj", use_container_width=True, key=f"dup_cancel_{source}"):
+            st.session_state.pending_insert = None
+            st.rerun()
+    return False
+
+total_count = count_rows()
+enrichment = start_enrichment()
 
 # 📊 SIDEBAR - ZOPTYMALIZOWANY I KOMPAKTOWY
 with st.sidebar:
@@ -368,9 +325,50 @@ with st.sidebar:
     
     st.markdown("---")
     if st.button("🔄 Odśwież Dane", use_container_width=True, key="refresh_btn"):
-        load_data.clear()
+        get_write_buffer().flush(st.session_state.session_id)
+        get_data_cache().clear()
         st.rerun()
     
+    # ✅ EKSPORT LICZONY DOPIERO PO KLIKNIĘCIU - razem z archiwum, bez kosztu przy każdym odświeżeniu
+    st.download_button("💾 Eksport CSV", data=export_csv, file_name="baza_eksport.csv",
+                       mime="text/csv", use_container_width=True, key="export_csv_btn")
+    
+    # 🗂️ PRZYWRACANIE KOPII ZAPASOWEJ
+    backups = list_backups()
+    if backups:
+        with st.expander("🗂️ Kopie zapasowe", expanded=False):
+            backup_choice = st.selectbox("Kopia:", [name for name, _ in backups],
+                                         format_func=lambda n: dict(backups)[n].strftime("%Y-%m-%d %H:%M:%S"),
+                                         key="backup_choice")
+            if st.button("♻️ Przywróć", use_container_width=True, key="restore_backup_btn"):
+                restored = restore_backup(backup_choice)
+                st.success(f"✅ Przywrócono {restored} ofert")
+                st.rerun()
+    
+    # 🧊 ARCHIWUM STARSZYCH MIESIĘCY - skompresowane, tylko do odczytu, wczytywane na żądanie
+    with st.expander("🧊 Archiwum", expanded=False):
+        archived_months = list_partitions()
+        if archived_months:
+            st.caption(f"{archived_rows()} ofert z {len(archived_months)} mies. ({archived_months[0]} – {archived_months[-1]})")
+        else:
+            st.caption("Archiwum jest puste")
+        if st.button(f"🧊 Archiwizuj starsze niż {ARCHIVE_KEEP_MONTHS} mies.", use_container_width=True, key="archive_btn"):
+            archived = archive_partitions()
+            if archived:
+                st.success(f"✅ Przeniesiono do archiwum {sum(archived.values())} ofert ({', '.join(archived)})")
+            else:
+                st.info("Brak starszych ofert do archiwizacji")
+    
+    # ⏱️ PROFIL - podział czasu ostatnich przebiegów (bieżący jeszcze trwa)
+    if PROFILE_ENABLED:
+        with st.expander(f"⏱️ Profil (ostatnie {PROFILE_RUNS} przebiegów)", expanded=False):
+            profile_rows = get_profiler().summary()
+            if profile_rows:
+                st.dataframe(pd.DataFrame(profile_rows).round(1), hide_index=True, use_container_width=True)
+                st.caption(f"📄 {PROFILE_LOG_PATH} • 📈 {PROFILE_METRICS_PATH}")
+            else:
+                st.caption("Brak zakończonych przebiegów")
+    
     st.markdown('</div>', unsafe_allow_html=True)
 
 # 🎯 GŁÓWNY INTERFEJS - PROPORCJE 60%/40%
@@ -394,52 +392,75 @@ with col1:
         st.session_state.link_opened = False
         st.session_state.last_query = st.session_state.search_query
 
+    # ⌨️ WYSZUKIWANIE W TLE - strona nie czeka na zapytanie, które użytkownik już zmienił
+    shown_search, search_pending = None, False
     if st.session_state.search_query:
-        with st.spinner("🔄 Szukam ofert..."):
-            current_search_results = search_multiple_platforms(st.session_state.search_query)
-        
-        sprzedajemy_result = current_search_results["sprzedajemy"]
-        ids_title, urls_title = sprzedajemy_result["ids_title"], sprzedajemy_result["urls_title"]
-        ids_id, urls_id = sprzedajemy_result["ids_id"], sprzedajemy_result["urls_id"]
+        force_refresh = st.button("🔄 Odśwież wyniki", key="refresh_search_btn")
+        st.session_state.searcher.submit(st.session_state.search_query, force_refresh=force_refresh)
+        shown_search, search_pending = st.session_state.searcher.status()
+        st.session_state.search_version = st.session_state.searcher.version
+        if search_pending:
+            if not shown_search:
+                st.info("🔄 Szukam ofert...")
+            elif shown_search[0] != st.session_state.search_query:
+                st.caption(f"🔄 Szukam: {st.session_state.search_query} - poniżej poprzednie wyniki ({shown_search[0]})")
+            wait_for_search()
 
-        st.markdown(f"#### 📋 Sprzedajemy.pl")
-        st.markdown(f"**Znalezione oferty:** Tytuły ({len(ids_title)}) | Numery ({len(ids_id)})")
-        
-        link_to_open = None
-        if not ids_title and not ids_id:
-            st.warning("❌ Brak ofert dla podanej frazy")
-        elif ids_title != ids_id:
-            if len(ids_title) == 1:
-                st.success("🎯 Znaleziono 1 ofertę")
-                link_to_open = urls_title[0]
-            elif len(ids_id) == 1:
-                st.success("🎯 Znaleziono 1 ofertę po numerze")
-                link_to_open = urls_id[0]
-            elif len(ids_title) > len(ids_id):
-                st.success("📖 Otwórz listę ofert z tytułów")
-                link_to_open = sprzedajemy_result["url_title"]
-            else:
-                st.success("🔢 Otwórz listę ofert z numerów")
-                link_to_open = sprzedajemy_result["url_id"]
-        else:
-            st.info(f"📊 Oferty znalezione: {ids_title[:3]}")
-            link_to_open = sprzedajemy_result["url_title"]
+    if shown_search:
+        current_search_results = shown_search[1]
+        for provider in enabled_providers():
+            provider_result = current_search_results.get(provider.name)
+            if provider.name not in current_search_results:
+                st.markdown(f"#### {provider.icon} {provider.label}")
+                st.caption("⏳ Szukam...")
+            elif provider.name == "sprzedajemy":
+                sprzedajemy_result = provider_result
+                ids_title, urls_title = sprzedajemy_result["ids_title"], sprzedajemy_result["urls_title"]
+                ids_id, urls_id = sprzedajemy_result["ids_id"], sprzedajemy_result["urls_id"]
 
-        # ✅ PRZYCISK ZAMIAST AUTOMATYCZNEGO OTWIERANIA
-        if link_to_open:
-            if st.button("🌐 OTWÓRZ OFERTĘ SPRZEDAJEMY.PL", use_container_width=True, key=f"open_sprzedajemy_{int(time.time())}"):
-                webbrowser.open_new_tab(link_to_open)
-                st.success("✅ Otwieram ofertę...")
+                st.markdown(f"#### 📋 Sprzedajemy.pl")
+                st.markdown(f"**Znalezione oferty:** Tytuły ({len(ids_title)}) | Numery ({len(ids_id)})")
+                
+                link_to_open = None
+                # ✅ AWARIA SERWISU TO NIE "BRAK OFERT"
+                if sprzedajemy_result["error"] == "unavailable":
+                    st.error("🚫 Sprzedajemy.pl niedostępne - kolejna próba za chwilę")
+                elif sprzedajemy_result["error"] == "timeout":
+                    st.error("⏱️ Sprzedajemy.pl nie odpowiada (przekroczony czas)")
+                elif sprzedajemy_result["error"]:
+                    st.error(f"Błąd połączenia: {sprzedajemy_result['error']}")
+                elif not ids_title and not ids_id:
+                    st.warning("❌ Brak ofert dla podanej frazy")
+                elif ids_title != ids_id:
+                    if len(ids_title) == 1:
+                        st.success("🎯 Znaleziono 1 ofertę")
+                        link_to_open = urls_title[0]
+                    elif len(ids_id) == 1:
+                        st.success("🎯 Znaleziono 1 ofertę po numerze")
+                        link_to_open = urls_id[0]
+                    elif len(ids_title) > len(ids_id):
+                        st.success("📖 Otwórz listę ofert z tytułów")
+                        link_to_open = sprzedajemy_result["url_title"]
+                    else:
+                        st.success("🔢 Otwórz listę ofert z numerów")
+                        link_to_open = sprzedajemy_result["url_id"]
+                else:
+                    st.info(f"📊 Oferty znalezione: {ids_title[:3]}")
+                    link_to_open = sprzedajemy_result["url_title"]
 
-        allegro_result = current_search_results["allegro"]
-        if allegro_result:
-            st.markdown(f"#### 🛒 allegro.pl")
-            st.markdown(f"**Gotowe wyszukiwanie:** Twoje oferty z filtrem")
-            
-            # ✅ PRZYCISK ALLEGRO
-            if st.button("🚀 OTWÓRZ ALLEGRO", key="open_allegro", use_container_width=True):
-                webbrowser.open_new_tab(allegro_result['link'])
-                st.success("✅ Otwieram allegro.pl...")
+                # ✅ PRZYCISK ZAMIAST AUTOMATYCZNEGO OTWIERANIA
+                if link_to_open:
+                    if st.button("🌐 OTWÓRZ OFERTĘ SPRZEDAJEMY.PL", use_container_width=True, key=f"open_sprzedajemy_{int(time.time())}"):
+                        webbrowser.open_new_tab(link_to_open)
+                        st.success("✅ Otwieram ofertę...")
+            elif provider_result and provider_result.get("link"):
+                st.markdown(f"#### {provider.icon} {provider.label}")
+                st.markdown(f"**Gotowe wyszukiwanie:** {provider.description}")
+                
+                # ✅ PRZYCISK DOSTAWCY
+                if st.button(f"🚀 OTWÓRZ {provider.label.upper()}", key=f"open_{provider.name}", use_container_width=True):
+                    webbrowser.open_new_tab(provider_result['link'])
+                    st.success(f"✅ Otwieram {provider.label}...")
 
     if st.session_state.search_query:
         if st.button("➕ DODAJ DO BAZY JAKO SPRZEDANE", 
@@ -450,30 +471,95 @@ with col1:
             now = datetime.now().strftime("%Y-%m-%d %H:%M")
             
             with st.spinner("🔄 Sprawdzam oferty..."):
-                fresh_results = search_multiple_platforms(st.session_state.search_query)
+                fresh_results = cached_search(st.session_state.search_query)
             
             if fresh_results:
                 offer_url, platform, opis = get_best_offer_link(fresh_results, st.session_state.search_query)
                 
-                new_row = {
-                    "id": f"{platform.lower().replace('.', '')}-{st.session_state.search_query}-{int(time.time())}",
-                    "tytul": f"{st.session_state.search_query}",
-                    "cena": "",
-                    "link": offer_url,
-                    "opis": opis,
-                    "status": f"Sprzedana ({now})",
-                    "notatka": "",
-                    "dodano": now
-                }
-                current_df = load_data()
-                new_df = pd.DataFrame([new_row])
-                updated_df = pd.concat([current_df, new_df], ignore_index=True)
-                save_data(updated_df)
-                st.success(f"✅ Dodano jako sprzedane ({platform})!")
-                st.rerun()
+                new_row = build_sold_row(st.session_state.search_query, offer_url, platform, opis, now)
+                if add_sold_rows([new_row], "search"):
+                    st.success(f"✅ Dodano jako sprzedane ({platform})!")
+                    st.rerun()
+        
+        if duplicate_prompt("search"):
+            st.success("✅ Dodano jako sprzedane!")
+            st.rerun()
     
     st.markdown('</div>', unsafe_allow_html=True)
     
+    # 📋 TRYB WSADOWY - LISTA NUMERÓW NA KONIEC DNIA
+    with st.expander("📋 Sprawdź listę części (tryb wsadowy)", expanded=bool(st.session_state.batch_results)):
+        batch_text = st.text_area(
+            "**Wklej numery części (jeden w linii lub po przecinku):**",
+            placeholder="5J0853661\n1Z0941015\nlusterko fabia",
+            height=120,
+            key="batch_text_input"
+        )
+        batch_file = st.file_uploader("...lub wgraj plik CSV (pierwsza kolumna)", type=["csv", "txt"], key="batch_file_input")
+        
+        if st.button("🔎 SPRAWDŹ LISTĘ", use_container_width=True, key="batch_search_btn"):
+            batch_queries = parse_batch_input(batch_text, batch_file)
+            if not batch_queries:
+                st.error("❌ Lista jest pusta!")
+            else:
+                progress = st.progress(0.0, text=f"🔄 Sprawdzam 0 / {len(batch_queries)}...")
+                st.session_state.batch_results = batch_lookup(
+                    batch_queries,
+                    on_result=lambda done, total, item: progress.progress(done / total, text=f"🔄 Sprawdzono {done} / {total}: {item['query']}")
+                )
+                progress.empty()
+        
+        if st.session_state.batch_results:
+            batch_df = pd.DataFrame(st.session_state.batch_results)
+            # ✅ DUPLIKATY Z BAZY I Z SAMEJ LISTY - domyślnie odznaczone
+            batch_dups = find_duplicates([{"tytul": r["query"], "link": r["link"]} for r in st.session_state.batch_results])
+            batch_df["duplikat"] = [f"{d['reason']}: {d['match'].get('tytul', '')} ({d['match'].get('dodano') or 'ta lista'})" if d else ""
+                                    for d in batch_dups]
+            batch_df.insert(0, "dodaj", batch_df["error"].isna() & (batch_df["duplikat"] == ""))
+            edited = st.data_editor(
+                batch_df[["dodaj", "query", "platform", "oferty", "duplikat", "link"]],
+                column_config={
+                    "dodaj": st.column_config.CheckboxColumn("Dodaj"),
+                    "query": "Część",
+                    "platform": "Platforma",
+                    "oferty": "Oferty",
+                    "duplikat": "Już sprzedane",
+                    "link": st.column_config.LinkColumn("Link"),
+                },
+                disabled=["query", "platform", "oferty", "duplikat", "link"],
+                hide_index=True,
+                use_container_width=True,
+                key="batch_editor"
+            )
+            failed = batch_df["error"].notna().sum()
+            if failed:
+                st.warning(f"⚠️ Błąd połączenia dla {failed} pozycji - odznaczone")
+            duplicated = (batch_df["duplikat"] != "").sum()
+            if duplicated:
+                if DUPLICATE_MODE == "block":
+                    st.warning(f"🚫 {duplicated} pozycji już sprzedanych - nie zostaną dodane")
+                else:
+                    st.warning(f"⚠️ {duplicated} pozycji już sprzedanych - odznaczone")
+            
+            col_batch_add, col_batch_clear = st.columns([3, 1])
+            with col_batch_add:
+                if st.button(f"➕ DODAJ ZAZNACZONE ({int(edited['dodaj'].sum())})", use_container_width=True,
+                             type="primary", key="batch_add_btn"):
+                    now = datetime.now().strftime("%Y-%m-%d %H:%M")
+                    chosen = batch_df[edited["dodaj"].values]
+                    if DUPLICATE_MODE == "block":
+                        chosen = chosen[chosen["duplikat"] == ""]
+                    # ✅ JEDEN ZAPIS DLA CAŁEJ LISTY
+                    insert_sold_rows([build_sold_row(r["query"], r["link"], r["platform"], r["opis"], now)
+                                      for _, r in chosen.iterrows()])
+                    st.session_state.batch_results = []
+                    st.success(f"✅ Dodano {len(chosen)} części jako sprzedane!")
+                    st.rerun()
+            with col_batch_clear:
+                if st.button("✖️ Wyczyść", use_container_width=True, key="batch_clear_btn"):
+                    st.session_state.batch_results = []
+                    st.rerun()
+    
     # 📤 DODAWANIE RĘCZNE
     st.markdown('<div class="manual-box">', unsafe_allow_html=True)
     st.markdown("### 📝 Dodaj ręcznie sprzedaną część")
@@ -500,6 +586,7 @@ with col1:
         value=st.session_state.manual_note
     )
     
+    manual_added = False
     if st.button("✅ DODAJ DO SPRZEDANYCH", 
                  use_container_width=True, 
                  type="primary",
@@ -507,31 +594,22 @@ with col1:
         
         if manual_id and manual_id.strip():
             now = datetime.now().strftime("%Y-%m-%d %H:%M")
-            new_row = {
-                "id": f"manual-{manual_id.strip()}-{int(time.time())}",
-                "tytul": manual_id.strip(),
-                "cena": "",
-                "link": manual_link.strip() if manual_link else "",
-                "opis": f"Ręcznie dodana oferta: {manual_id.strip()}",
-                "status": f"Sprzedana ({now})",
-                "notatka": manual_note.strip() if manual_note else "",
-                "dodano": now
-            }
-            current_df = load_data()
-            new_df = pd.DataFrame([new_row])
-            updated_df = pd.concat([current_df, new_df], ignore_index=True)
-            save_data(updated_df)
-            
-            st.session_state.manual_id = ""
-            st.session_state.manual_link = ""
-            st.session_state.manual_note = ""
-            
-            st.success("🎉 Oferta dodana do bazy sprzedanych!")
-            time.sleep(0.5)
-            st.rerun()
+            new_row = build_manual_row(manual_id.strip(), manual_link.strip() if manual_link else "",
+                                       manual_note.strip() if manual_note else "", now)
+            if add_sold_rows([new_row], "manual"):
+                manual_added = True
         else:
             st.error("❌ Wpisz numer oferty/części!")
     
+    if duplicate_prompt("manual") or manual_added:
+        st.session_state.manual_id = ""
+        st.session_state.manual_link = ""
+        st.session_state.manual_note = ""
+        
+        st.success("🎉 Oferta dodana do bazy sprzedanych!")
+        time.sleep(0.5)
+        st.rerun()
+    
     st.markdown('</div>', unsafe_allow_html=True)
 
 # 📦 PANEL SPRZEDANYCH OFERT - 40% (LEPSZA CZYTELNOŚĆ)
@@ -539,90 +617,172 @@ with col2:
     # ✅ MINIMALNE STATYSTYKI NAD BAZĄ
     st.markdown("### 📦 Baza Sprzedanych Ofert")
     
-    if not df.empty:
+    if total_count:
         col_stat1, col_stat2 = st.columns(2)
         with col_stat1:
             st.markdown(f"""
                 <div class="stats-mini">
-                    <div class="stats-number">{len(df)}</div>
+                    <div class="stats-number">{total_count}</div>
                     <div class="stats-label">Łącznie ofert</div>
                 </div>
             """, unsafe_allow_html=True)
         with col_stat2:
             # ✅ DODANA DOKŁADNA GODZINA OSTATNIEJ OFERTY
-            last_added = df['dodano'].max()
-            last_time = last_added[:16] if len(last_added) >= 16 else last_added
+            last_dodano = last_added()
+            last_time = last_dodano[:16] if len(last_dodano) >= 16 else last_dodano
             st.markdown(f"""
                 <div class="stats-mini">
                     <div class="stats-number">{last_time}</div>
                     <div class="stats-label">Ostatnia</div>
                 </div>
             """, unsafe_allow_html=True)
+        
+        # 📈 STATYSTYKI SPRZEDAŻY - sumy utrzymywane przyrostowo, bez liczenia całej bazy
+        # ✅ PRZEŁĄCZNIK ZAMIAST EXPANDERA - zwinięty expander i tak wykonuje swoją treść,
+        # więc statystyki liczymy dopiero po włączeniu panelu
+        if st.toggle("📈 Statystyki sprzedaży", key="stats_open"):
+            stats_period = st.selectbox("Okres:", STATS_PERIODS, index=len(STATS_PERIODS) - 1, key="stats_period")
+            # ✅ ARCHIWUM TYLKO NA ŻĄDANIE - bez niego statystyki kosztują tyle, co ostatnie miesiące
+            stats_archive = bool(list_partitions()) and st.checkbox("🧊 Z archiwum", key="stats_archive")
+            stats_df, top_parts = sales_stats(stats_period, archive=stats_archive)
+            st.dataframe(stats_df, use_container_width=True)
+            if top_parts:
+                st.caption("🔁 Najczęściej sprzedawane numery: " + ", ".join(f"**{part}** ×{count}" for part, count in top_parts))
     
     st.markdown('<div class="secondary-box">', unsafe_allow_html=True)
     
-    if df.empty:
+    if not total_count:
         st.info("📭 Brak ofert w bazie. Dodaj pierwszą ofertę używając formularza po lewej.")
     else:
-        sort_option = st.selectbox("Sortuj:", ["Najnowsze", "Najstarsze", "Alfabetycznie"], key="sort_sold")
+        filter_query = st.text_input("🔎 Szukaj w bazie:", placeholder="numer części, notatka, link...", key="sold_filter")
         
-        filtered_df = df.copy()
+        col_sort, col_size = st.columns([2, 1])
+        with col_sort:
+            sort_option = st.selectbox("Sortuj:", list(SORT_OPTIONS), key="sort_sold")
+        with col_size:
+            size_options = sorted(set(PAGE_SIZE_OPTIONS + [PAGE_SIZE]))
+            page_size = st.selectbox("Na stronę:", size_options, index=size_options.index(PAGE_SIZE), key="page_size")
         
-        if sort_option == "Najnowsze":
-            filtered_df = filtered_df.sort_values('dodano', ascending=False)
-        elif sort_option == "Najstarsze":
-            filtered_df = filtered_df.sort_values('dodano', ascending=True)
-        else:
-            filtered_df = filtered_df.sort_values('tytul', ascending=True)
+        # 🔎 FILTR Z INDEKSU - bez skanowania całej bazy
+        matched_df = search_sold(filter_query) if filter_query.strip() else None
+        shown_count = total_count if matched_df is None else len(matched_df)
+        if matched_df is not None:
+            st.caption(f"🔎 Znaleziono: {shown_count}")
+        
+        # 📄 TYLKO BIEŻĄCA STRONA - koszt odświeżenia zależy od rozmiaru strony, nie bazy
+        page_count = max(1, -(-shown_count // page_size))
+        page = min(max(st.session_state.sold_page, 0), page_count - 1)
+        st.session_state.sold_page = page
+        offset = page * page_size
+        filtered_df = load_sorted(sort_option, limit=page_size, offset=offset, df=matched_df)
+        
+        # ✏️ NIEZAPISANE EDYCJE Z BUFORA
+        write_buffer = get_write_buffer()
+        pending_edits = write_buffer.pending_count(st.session_state.session_id)
+        if pending_edits:
+            col_pending, col_flush = st.columns([3, 1])
+            with col_pending:
+                st.caption(f"✏️ Niezapisane zmiany: {pending_edits}")
+            with col_flush:
+                if st.button("💾 Zapisz", key="flush_edits_btn", use_container_width=True):
+                    write_buffer.flush(st.session_state.session_id)
+                    st.rerun()
         
-        # ✅ KOMPAKTOWY WIDOK OFERT
-        for idx, row in filtered_df.iterrows():
-            platform = "Sprzedajemy.pl"
-            if "allegro" in str(row["id"]).lower() or "allegro" in str(row["link"]).lower():
-                platform = "Allegro"
-            elif "sprzedajemy" in str(row["id"]).lower():
-                platform = "Sprzedajemy.pl"
-            elif "manual" in str(row["id"]).lower():
-                platform = "Ręczna"
+        # 🏷️ OFERTY CZEKAJĄCE NA CENĘ ZE STRONY OFERTY
+        if enrichment is not None:
+            # ✅ WERSJA PRZED LICZNIKIEM - zadanie zakończone w międzyczasie i tak odświeży stronę
+            enrich_version = enrichment.version
+            enrich_pending = enrichment.counts().get("pending", 0)
+            if enrich_pending:
+                st.caption(f"🏷️ Pobieram ceny z ofert: {enrich_pending} w kolejce")
+                wait_for_enrichment(enrichment, enrich_version)
+        
+        # ⚠️ KONFLIKTY - ktoś inny zmienił lub usunął ofertę w międzyczasie
+        for conflict in write_buffer.pop_conflicts(st.session_state.session_id):
+            if conflict["current"] is None:
+                st.warning(f"⚠️ Oferta {conflict['id']} została usunięta - zmiana pola '{conflict['column']}' nie została zapisana.")
+            else:
+                st.warning(f"⚠️ Pole '{conflict['column']}' oferty {conflict['id']} zmienił ktoś inny "
+                           f"(obecnie: '{conflict['current']}') - Twoja zmiana '{conflict['value']}' została odrzucona.")
+        
+        # ✅ KOMPAKTOWY WIDOK OFERT - pola edycji tylko dla rozwiniętego wiersza
+        opened = False
+        render_start = time.perf_counter()
+        for pos, (idx, row) in enumerate(filtered_df.iterrows()):
+            # ✅ PLATFORMA I SKRÓCONY TYTUŁ - wyliczone przy wczytaniu danych
+            platform = row["platform"]
+            short_title = row["short_title"]
+            # 🧊 WIERSZ Z ARCHIWUM - tylko do odczytu
+            archived = bool(row.get("archiwum", False))
+            
+            is_open = not opened and st.session_state.expanded_row == row["id"]
+            if st.button(f"{'📂' if is_open else '🧊' if archived else '📦'} {short_title} [{platform}]", key=f"row_toggle_{offset + pos}", use_container_width=True):
+                st.session_state.expanded_row = None if is_open else row["id"]
+                st.rerun()
             
-            # ✅ SKRÓCONY TYTUŁ DLA LEPSZEJ CZYTELNOŚCI
-            short_title = row['tytul'][:35] + "..." if len(row['tytul']) > 35 else row['tytul']
+            if not is_open:
+                continue
+            opened = True
             
-            with st.expander(f"📦 {short_title} [{platform}]", expanded=False):
+            with st.container(border=True):
                 col_info, col_actions = st.columns([3, 1])
                 
                 with col_info:
-                    title_key = f"title_{idx}"
-                    link_key = f"link_{idx}"
-                    note_key = f"note_{idx}"
+                    title_key = f"title_{row['id']}"
+                    link_key = f"link_{row['id']}"
+                    note_key = f"note_{row['id']}"
                     
-                    st.text_input("**Numer oferty:**", value=row["tytul"], key=title_key, 
-                                on_change=lambda i=idx, k=title_key: save_field(i, k, "tytul"))
+                    # ✅ WARTOŚCI WIDZIANE PRZEZ UŻYTKOWNIKA - przy zapisie sprawdzamy, czy nikt ich nie zmienił
+                    shown_title = write_buffer.get(row["id"], "tytul", row["tytul"])
+                    shown_link = write_buffer.get(row["id"], "link", row["link"])
+                    shown_note = write_buffer.get(row["id"], "notatka", row["notatka"])
+                    seen_title = st.session_state.get(title_key, shown_title)
+                    seen_link = st.session_state.get(link_key, shown_link)
+                    seen_note = st.session_state.get(note_key, shown_note)
                     
-                    st.text_input("**Link do oferty:**", value=row["link"], key=link_key,
-                                on_change=lambda i=idx, k=link_key: save_field(i, k, "link"))
+                    st.text_input("**Numer oferty:**", value=shown_title, key=title_key, disabled=archived,
+                                on_change=lambda r=row["id"], k=title_key, v=seen_title: save_field(r, k, "tytul", v))
+                    
+                    st.text_input("**Link do oferty:**", value=shown_link, key=link_key, disabled=archived,
+                                on_change=lambda r=row["id"], k=link_key, v=seen_link: save_field(r, k, "link", v))
                     
                     # ✅ PRZYCISK ZAMIAST LINK_BUTTON
                     if isinstance(row["link"], str) and row["link"].startswith("http"):
-                        if st.button("🔗 OTWÓRZ OFERTĘ", key=f"open_offer_{idx}", use_container_width=True):
+                        if st.button("🔗 OTWÓRZ OFERTĘ", key=f"open_offer_{row['id']}", use_container_width=True):
                             webbrowser.open_new_tab(row["link"])
                             st.success("Otwieram...")
                     else:
                         st.caption("🔗 Brak linku")
                     
-                    st.text_area("**Notatka:**", value=row["notatka"], key=note_key, height=80,
-                               on_change=lambda i=idx, k=note_key: save_field(i, k, "notatka"))
+                    st.text_area("**Notatka:**", value=shown_note, key=note_key, height=80, disabled=archived,
+                               on_change=lambda r=row["id"], k=note_key, v=seen_note: save_field(r, k, "notatka", v))
                     
-                    st.caption(f"🕒 Dodano: {row['dodano']} | Platforma: {platform}")
+                    st.caption(f"💰 Cena: {row['cena'] or '—'} | 📝 {row['opis']}")
+                    st.caption(f"🕒 Dodano: {row['dodano']} | Platforma: {platform}" + (" | 🧊 Archiwum (tylko do odczytu)" if archived else ""))
                 
                 with col_actions:
                     st.write("")
-                    if st.button("🗑️ Usuń", key=f"del_{idx}", use_container_width=True):
-                        current_df = load_data()
-                        updated_df = current_df.drop(idx).reset_index(drop=True)
-                        save_data(updated_df)
+                    if not archived and st.button("🗑️ Usuń", key=f"del_{row['id']}", use_container_width=True):
+                        delete_row(row["id"])
+                        st.session_state.expanded_row = None
                         st.success("🗑️ Oferta usunięta!")
                         st.rerun()
+        
+        record_stage("render_rows", render_start)
+        
+        # 📄 NAWIGACJA STRON
+        if page_count > 1:
+            col_prev, col_page, col_next = st.columns([1, 2, 1])
+            with col_prev:
+                if st.button("◀", key="page_prev", use_container_width=True, disabled=page == 0):
+                    st.session_state.sold_page = page - 1
+                    st.rerun()
+            with col_page:
+                st.caption(f"Strona {page + 1} / {page_count} ({shown_count} ofert)")
+            with col_next:
+                if st.button("▶", key="page_next", use_container_width=True, disabled=page >= page_count - 1):
+                    st.session_state.sold_page = page + 1
+                    st.rerun()
     st.markdown('</div>', unsafe_allow_html=True)
 
 st.markdown("---")
@@ -631,3 +791,6 @@ st.markdown("""
         🚗 <b>System OS-CAR</b> | Proste • Skuteczne • Niezawodne
     </div>
 """, unsafe_allow_html=True)
+
+if PROFILE_ENABLED:
+    get_profiler().finish_run()
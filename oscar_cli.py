@@ -0,0 +1,311 @@
+# 🖥️ OS-CAR BEZ PRZEGLĄDARKI - CLI i lokalne API JSON dla skryptów i innych narzędzi sklepu
+#
+#   python oscar_cli.py serve                            # ciepły proces: API na 127.0.0.1:8765
+#   python oscar_cli.py search "5J0853661"
+#   python oscar_cli.py add "5J0853661"                  # jak "DODAJ DO BAZY JAKO SPRZEDANE"
+#   python oscar_cli.py add "5J0853661" --manual --link https://... --note "wysłane"
+#   python oscar_cli.py list --query 5J0 --limit 20
+#   python oscar_cli.py export --output baza_eksport.csv
+#   python oscar_cli.py stats --period Tydzień
+#   python oscar_cli.py archive --keep-months 3                # starsze miesiące do archive/ (np. z crona)
+#   python oscar_cli.py enrich --timeout 120                   # ceny i tytuły ze stron ofert czekające w kolejce
+#
+# Polecenia najpierw pytają działający serwer (OSCAR_API_URL) - odpowiedź w milisekundach, bez
+# importu pandas. Gdy serwer nie działa, polecenie wykonuje się lokalnie (oscar_core ładowany dopiero wtedy).
+#
+# "add" tylko zapisuje zadanie pobrania ceny ze strony oferty - wykonuje je serwer w tle albo polecenie "enrich".
+#
+# API (GET z parametrami w adresie lub POST z JSON): /health, /search, /add, /list, /export, /stats, /archive, /enrich
+#   curl "http://127.0.0.1:8765/list?query=5J0&limit=5"
+#   curl -H "Content-Type: application/json" -d '{"query": "5J0853661", "manual": true}' http://127.0.0.1:8765/add
+# /add, /archive i /enrich zmieniają dane - tylko POST z Content-Type: application/json (inaczej 405)
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+API_HOST = "127.0.0.1"
+API_PORT = int(os.environ.get("OSCAR_API_PORT", "8765"))
+API_URL = os.environ.get("OSCAR_API_URL", f"http://{API_HOST}:{API_PORT}")
+API_TIMEOUT = 60
+
+
+def core():
+    # ✅ LENIWY IMPORT - pandas / requests ładowane tylko tam, gdzie polecenie naprawdę się wykonuje
+    import oscar_core
+    return oscar_core
+
+
+def as_bool(value):
+    return value in (True, 1, "1", "true", "True", "tak")
+
+
+# 🔧 POLECENIA - te same funkcje dla CLI (lokalnie) i dla serwera API
+def do_search(query, refresh=False):
+    c = core()
+    results = c.cached_search(query, force_refresh=as_bool(refresh))
+    offer_url, platform, opis = c.get_best_offer_link(results, query)
+    return {"query": query, "best": {"link": offer_url, "platform": platform, "opis": opis}, **results}
+
+
+def do_add(query, link="", note="", manual=False, force=False):
+    c = core()
+    now = time.strftime(c.DODANO_FORMAT)
+    if as_bool(manual) or link:
+        row = c.build_manual_row(query, link, note, now)
+    else:
+        results = c.cached_search(query)
+        row = c.build_sold_row(query, *c.get_best_offer_link(results, query), now)
+        row["notatka"] = note
+    # ✅ DUPLIKATY JAK W INTERFEJSIE - dodanie tylko z force (i nigdy w trybie "block")
+    duplicates = [d for d in c.find_duplicates([row]) if d]
+    if duplicates and (not as_bool(force) or c.DUPLICATE_MODE == "block"):
+        return {"added": False, "row": row, "duplicates": duplicates}
+    c.insert_rows([row])
+    enriching = c.enqueue_enrichment([row])
+    return {"added": True, "row": row, "duplicates": duplicates, "enriching": bool(enriching)}
+
+
+def do_list(query="", sort="Najnowsze", limit=20, offset=0):
+    c = core()
+    if sort not in c.SORT_OPTIONS:
+        raise ValueError(f"Nieznane sortowanie: {sort} (dostępne: {', '.join(c.SORT_OPTIONS)})")
+    df = c.search_sold(query) if query else None
+    total = len(df) if df is not None else c.count_rows()
+    page = c.load_sorted(sort, limit=int(limit), offset=int(offset), df=df)
+    return {"total": total, "offset": int(offset), "rows": page[c.COLUMNS].to_dict("records")}
+
+
+def do_export():
+    return core().export_csv().decode("utf-8")
+
+
+def do_stats(period="Miesiąc", limit=12, archive=False):
+    c = core()
+    if period not in c.STATS_PERIODS:
+        raise ValueError(f"Nieznany okres: {period} (dostępne: {', '.join(c.STATS_PERIODS)})")
+    stats_df, top_parts = c.sales_stats(period, int(limit), archive=as_bool(archive))
+    return {
+        "period": period,
+        "rows": stats_df.reset_index().to_dict("records"),
+        "top_parts": [{"part": part, "count": count} for part, count in top_parts],
+    }
+
+
+def do_archive(keep_months=None):
+    c = core()
+    keep_months = c.ARCHIVE_KEEP_MONTHS if keep_months is None else int(keep_months)
+    archived = c.archive_partitions(keep_months)
+    return {"archived": archived, "rows": sum(archived.values()), "partitions": c.list_partitions()}
+
+
+def do_enrich(timeout=30, retry_failed=False):
+    c = core()
+    enrichment = c.start_enrichment()
+    if enrichment is None:
+        raise ValueError("Uzupełnianie z ofert wyłączone (OSCAR_ENRICH=0)")
+    retried = enrichment.retry_failed() if as_bool(retry_failed) else 0
+    finished = enrichment.wait(float(timeout))
+    return {"finished": finished, "retried": retried, "jobs": enrichment.counts()}
+
+
+COMMANDS = {
+    "search": do_search, "add": do_add, "list": do_list, "export": do_export, "stats": do_stats,
+    "archive": do_archive, "enrich": do_enrich,
+}
+# 🔒 POLECENIA ZMIENIAJĄCE DANE - tylko POST z JSON; GET (np. <img src> z obcej strony w przeglądarce) dostaje 405
+WRITE_COMMANDS = {"add", "archive", "enrich"}
+
+
+# 🌐 SERWER - jeden ciepły proces, dane i sesja HTTP zostają w pamięci między zapytaniami
+def serve(host=API_HOST, port=API_PORT):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class ApiHandler(BaseHTTPRequestHandler):
+        def send_body(self, status, body, content_type, headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            for header, value in (headers or {}).items():
+                self.send_header(header, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_json(self, status, data, headers=None):
+            self.send_body(status, json.dumps(data, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8", headers)
+
+        def reject_method(self, name):
+            self.send_json(405, {"error": f"/{name} wymaga POST z Content-Type: application/json"}, {"Allow": "POST"})
+
+        def command_name(self):
+            return urllib.parse.urlsplit(self.path).path.strip("/")
+
+        def host_allowed(self):
+            # ✅ TYLKO WŁASNY ADRES W NAGŁÓWKU HOST - strona z DNS rebinding (zły.pl -> 127.0.0.1) wysyła
+            # Host: zły.pl i nie dostanie odpowiedzi ani nie zapisze zmian
+            port = self.server.server_address[1]
+            names = {"127.0.0.1", "localhost"} | ({host} if host not in ("", "0.0.0.0", "::") else set())
+            if (self.headers.get("Host") or "").strip().lower() in {f"{name}:{port}" for name in names}:
+                return True
+            self.send_json(403, {"error": "Niedozwolony nagłówek Host"})
+            return False
+
+        def handle_command(self, name, params):
+            if name == "health":
+                return self.send_json(200, {"ok": True, "pid": os.getpid()})
+            if name not in COMMANDS:
+                return self.send_json(404, {"error": f"Nieznane polecenie: {name}"})
+            try:
+                result = COMMANDS[name](**params)
+            except (TypeError, ValueError, KeyError) as e:
+                return self.send_json(400, {"error": str(e)})
+            except Exception as e:
+                # ✅ BŁĄD ZAPISU / ODCZYTU - odpowiedź zamiast zerwanego połączenia
+                return self.send_json(500, {"error": f"{type(e).__name__}: {e}"})
+            if name == "export":
+                return self.send_body(200, result.encode("utf-8"), "text/csv; charset=utf-8")
+            self.send_json(200, result)
+
+        def do_GET(self):
+            if not self.host_allowed():
+                return
+            name = self.command_name()
+            if name in WRITE_COMMANDS:
+                return self.reject_method(name)
+            self.handle_command(name, dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(self.path).query)))
+
+        def do_POST(self):
+            if not self.host_allowed():
+                return
+            name = self.command_name()
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length)
+            # ✅ ZAPIS TYLKO Z JSON - formularz z obcej strony (text/plain, x-www-form-urlencoded) nie wyśle
+            # application/json bez zgody CORS, której serwer nie daje
+            content_type = self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            if name in WRITE_COMMANDS and content_type != "application/json":
+                return self.reject_method(name)
+            try:
+                params = json.loads(body or b"{}")
+            except ValueError:
+                return self.send_json(400, {"error": "Niepoprawny JSON"})
+            if not isinstance(params, dict):
+                return self.send_json(400, {"error": "Oczekiwany obiekt JSON"})
+            self.handle_command(name, params)
+
+        def log_message(self, *args):
+            pass
+
+    # ✅ ROZGRZANIE - migracje, baza w cache i pula połączeń gotowe przed pierwszym zapytaniem
+    c = core()
+    c.prepare_storage()
+    c.load_data()
+    c.get_http_session()
+    c.start_enrichment()
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    print(f"🚗 OS-CAR API: http://{host}:{server.server_address[1]} (Ctrl+C kończy)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        c.get_write_buffer().flush()
+
+
+# 🖥️ KLIENT - serwer, a bez niego wykonanie lokalne
+def call_api(name, params):
+    request = urllib.request.Request(
+        f"{API_URL}/{name}",
+        data=json.dumps(params).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=API_TIMEOUT) as response:
+            body = response.read().decode("utf-8")
+    except urllib.error.HTTPError as e:
+        raise ValueError(json.loads(e.read().decode("utf-8")).get("error", str(e)))
+    return body if name == "export" else json.loads(body)
+
+
+def run(name, params, local=False):
+    if not local:
+        try:
+            return call_api(name, params)
+        except urllib.error.URLError:
+            pass
+    return COMMANDS[name](**params)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="OS-CAR bez przeglądarki")
+    parser.add_argument("--local", action="store_true", help="nie pytaj serwera, wykonaj w tym procesie")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="uruchom lokalne API JSON (ciepły proces)")
+    serve_parser.add_argument("--host", default=API_HOST)
+    serve_parser.add_argument("--port", type=int, default=API_PORT)
+
+    search_parser = commands.add_parser("search", help="szukaj ofert (sprzedajemy.pl + allegro)")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--refresh", action="store_true", help="pomiń cache wyników")
+
+    add_parser = commands.add_parser("add", help="dodaj do bazy jako sprzedane")
+    add_parser.add_argument("query", help="numer oferty / części")
+    add_parser.add_argument("--link", default="", help="link do oferty (oznacza dodanie ręczne)")
+    add_parser.add_argument("--note", default="", help="notatka")
+    add_parser.add_argument("--manual", action="store_true", help="bez wyszukiwania, jak 'Dodaj ręcznie'")
+    add_parser.add_argument("--force", action="store_true", help="dodaj mimo duplikatu")
+
+    list_parser = commands.add_parser("list", help="lista sprzedanych")
+    list_parser.add_argument("--query", default="", help="szukaj w bazie")
+    list_parser.add_argument("--sort", default="Najnowsze")
+    list_parser.add_argument("--limit", type=int, default=20)
+    list_parser.add_argument("--offset", type=int, default=0)
+
+    export_parser = commands.add_parser("export", help="eksport bazy do CSV")
+    export_parser.add_argument("--output", help="plik CSV (domyślnie stdout)")
+
+    stats_parser = commands.add_parser("stats", help="statystyki sprzedaży per okres i platforma")
+    stats_parser.add_argument("--period", default="Miesiąc", help="Dzień, Tydzień lub Miesiąc")
+    stats_parser.add_argument("--limit", type=int, default=12, help="liczba ostatnich okresów")
+    stats_parser.add_argument("--archive", action="store_true", help="razem z zarchiwizowanymi miesiącami")
+
+    archive_parser = commands.add_parser("archive", help="przenieś starsze miesiące do skompresowanego archiwum")
+    archive_parser.add_argument("--keep-months", type=int, help="ile ostatnich miesięcy zostaje w bazie")
+
+    enrich_parser = commands.add_parser("enrich", help="pobierz ceny i tytuły ze stron ofert czekających w kolejce")
+    enrich_parser.add_argument("--timeout", type=float, default=30, help="najdłuższe czekanie na kolejkę (s)")
+    enrich_parser.add_argument("--retry-failed", action="store_true", help="ponów też zadania zakończone błędem")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args.host, args.port)
+        return 0
+
+    params = {k: v for k, v in vars(args).items() if k not in ("command", "local", "output")}
+    try:
+        result = run(args.command, params, local=args.local)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+    if args.command == "export":
+        if args.output:
+            with open(args.output, "w", encoding="utf-8", newline="") as f:
+                f.write(result)
+        else:
+            sys.stdout.write(result)
+        return 0
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.command == "add" and not result["added"]:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
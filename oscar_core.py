@@ -0,0 +1,2628 @@
+# 🚗 OS-CAR - logika bez interfejsu: wyszukiwanie, baza sprzedanych, kopie zapasowe
+# Importowana przez main.py (Streamlit) i oscar_cli.py (CLI / API JSON) - bez Streamlita.
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import os
+import requests
+from html.parser import HTMLParser
+from datetime import datetime
+import re
+import json
+import csv
+import bisect
+import sqlite3
+import gzip
+import hashlib
+import queue
+import random
+import atexit
+import functools
+import heapq
+import math
+import uuid
+import weakref
+from contextlib import contextmanager
+from io import BytesIO
+from datetime import timedelta
+from urllib.parse import quote_plus, urlsplit
+import time
+import threading
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from requests.adapters import HTTPAdapter
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+CSV_PATH = "baza.csv"
+COLUMNS = ["id", "tytul", "cena", "link", "opis", "status", "notatka", "dodano"]
+# 🧮 KOLUMNY WYLICZANE PRZY WCZYTANIU (nie są zapisywane)
+PLATFORMS = ["Sprzedajemy.pl", "Allegro", "Ręczna"]
+SHORT_TITLE_LEN = 35
+DODANO_FORMAT = "%Y-%m-%d %H:%M"
+DERIVED_SOURCES = {"id", "tytul", "cena", "link", "dodano"}
+# ✅ WERSJA REGUŁ KOLUMN POCHODNYCH - pliki Arrow zapisane według starszych reguł są przeliczane
+DERIVED_VERSION = "3"
+# 🔎 WYSZUKIWANIE W BAZIE - indeksowane kolumny
+INDEX_COLUMNS = ["tytul", "notatka", "opis", "link"]
+TOKEN_RE = re.compile(r"[0-9a-ząćęłńóśźż]+")
+INDEX_BULK_ROWS = 1000
+# ✅ ILE OSTATNICH WERSJI RAMKI PAMIĘTA ZBIORY ZMIENIONYCH id (indeksy poprawiają tylko te wiersze)
+DATA_HISTORY = 64
+# 👯 DUPLIKATY - "warn" (ostrzeżenie + możliwość dodania) lub "block"
+DUPLICATE_MODE = os.environ.get("OSCAR_DUPLICATES", "warn")
+# Numer części: ciąg liter i cyfr z co najmniej jedną cyfrą i PART_MIN_LEN znakami ("octavia 2" / "2012" to nie numery),
+# numer pisany w kawałkach ("5J0 857 507", "5J0-857-507") sklejany jak w tokenize
+PART_CHARS = "0-9a-ząćęłńóśźż"
+PART_RUN_RE = re.compile(rf"[{PART_CHARS}]*\d[{PART_CHARS}]*(?:[^{PART_CHARS}]+[{PART_CHARS}]*\d[{PART_CHARS}]*)*")
+PART_SEP_RE = re.compile(rf"[^{PART_CHARS}]+")
+PART_MIN_LEN = 6
+PART_CACHE_SIZE = 1 << 18
+URL_PREFIX_RE = r"^/*(?:https?:?/*)*(?:www\.)?"
+URL_SUFFIX_RE = r"(?:/*#.*|/+)$"
+# 💾 TRYB ZAPISU: "csv" (pełny zapis pliku), "journal" (dziennik zmian + kompaktowanie),
+# "sqlite" (baza SQLite z indeksami) lub "arrow" (plik kolumnowy Arrow IPC z typami i kolumnami pochodnymi)
+STORAGE_MODE = os.environ.get("OSCAR_STORAGE", "csv")
+JOURNAL_PATH = "baza.journal.jsonl"
+JOURNAL_COMPACT_BYTES = 1024 * 1024
+DB_PATH = "baza.db"
+ARROW_PATH = "baza.arrow"
+# 🧊 ARCHIWUM - miesiące starsze niż ARCHIVE_KEEP_MONTHS przenoszone do skompresowanych plików tylko do odczytu
+ARCHIVE_DIR = "archive"
+ARCHIVE_KEEP_MONTHS = int(os.environ.get("OSCAR_ARCHIVE_MONTHS", "3"))
+ARCHIVE_COMPRESSION = "zstd"
+# ✅ WINDOWS NIE PODMIENI PLIKU ZMAPOWANEGO W PAMIĘCI - tam plik Arrow czytamy zwykłym odczytem
+ARROW_MMAP = fcntl is not None
+LOCK_PATH = "baza.lock"
+BACKUP_DIR = "backups"
+# 🗂️ RETENCJA KOPII: co godzinę przez dobę, codziennie przez miesiąc
+BACKUP_HOURLY_FOR = timedelta(days=1)
+BACKUP_DAILY_FOR = timedelta(days=30)
+BACKUP_MIN_INTERVAL = 60
+# ✏️ EDYCJE POLA SĄ ZBIERANE I ZAPISYWANE RAZEM PO TYM CZASIE (s)
+WRITE_BEHIND_DELAY = 2.0
+# 📄 STRONICOWANIE PANELU SPRZEDANYCH
+PAGE_SIZE_OPTIONS = [10, 20, 50, 100]
+PAGE_SIZE = int(os.environ.get("OSCAR_PAGE_SIZE", "20"))
+# 🔃 SORTOWANIE: opcja z selectboxa -> (kolumna, rosnąco)
+SORT_OPTIONS = {
+    "Najnowsze": ("dodano", False),
+    "Najstarsze": ("dodano", True),
+    "Alfabetycznie": ("tytul", True),
+}
+# 📈 STATYSTYKI SPRZEDAŻY - okresy z selectboxa, liczba okresów w tabeli i powtarzających się numerów
+STATS_PERIODS = ["Dzień", "Tydzień", "Miesiąc"]
+STATS_ROWS = 12
+STATS_TOP_PARTS = 10
+STATS_COLUMNS = ["platform", "dodano_dt", "cena_num", "part_key"]
+SPRZEDAJEMY_URL = os.environ.get("OSCAR_SPRZEDAJEMY_URL", "https://oscar.sprzedajemy.pl")
+HTTP_HEADERS = {"User-Agent": "Mozilla/5.0"}
+HTTP_TIMEOUT = 8
+HTTP_CONNECT_TIMEOUT = 3
+# 🛡️ ODPORNOŚĆ NA AWARIE - ponowienia z losowym odstępem, po BREAKER_FAILURES błędach host wyłączony na BREAKER_COOLDOWN s
+HTTP_RETRIES = 2
+HTTP_BACKOFF_BASE = 0.2
+HTTP_BACKOFF_MAX = 2.0
+HTTP_RETRY_STATUSES = {429, 500, 502, 503, 504}
+BREAKER_FAILURES = 3
+BREAKER_COOLDOWN = 30
+SEARCH_CACHE_TTL = 600
+SEARCH_CACHE_MAX_ENTRIES = 256
+# 💽 CACHE HTTP NA DYSKU - świeże przez HTTP_CACHE_TTL s, potem rewalidacja (ETag / Last-Modified)
+# OSCAR_HTTP_SWR=1: przeterminowana odpowiedź (do HTTP_CACHE_STALE_MAX s) od razu, odświeżenie w tle
+HTTP_CACHE_ENABLED = os.environ.get("OSCAR_HTTP_CACHE", "1") != "0"
+HTTP_CACHE_PATH = "http_cache.db"
+HTTP_CACHE_MAX_BYTES = 50 * 1024 * 1024
+HTTP_CACHE_TTL = 600
+HTTP_CACHE_SWR = os.environ.get("OSCAR_HTTP_SWR", "0") == "1"
+HTTP_CACHE_STALE_MAX = 24 * 3600
+# ⌨️ WYSZUKIWANIE W TLE - zapytanie startuje po SEARCH_DEBOUNCE s bez nowszego, UI sprawdza co SEARCH_POLL_INTERVAL s
+SEARCH_DEBOUNCE = 0.3
+SEARCH_POLL_INTERVAL = 0.25
+SEARCH_WORKERS = 4
+# 🧩 DOSTAWCY WYSZUKIWANIA - OSCAR_PROVIDERS="sprzedajemy,allegro" ogranicza listę (domyślnie wszyscy)
+ENABLED_PROVIDERS = [p.strip() for p in os.environ.get("OSCAR_PROVIDERS", "").split(",") if p.strip()]
+PROVIDER_WORKERS = 16
+OVOKO_SEARCH_URL = os.environ.get("OSCAR_OVOKO_SEARCH_URL", "https://ovoko.pl/szukaj?q={query}")
+POLCAR_SEARCH_URL = os.environ.get("OSCAR_POLCAR_SEARCH_URL", "https://catalog.polcar.com/polcar/?searchText={query}")
+# 📋 TRYB WSADOWY - równoległe wyszukiwania z limitem zapytań na sekundę
+BATCH_WORKERS = 4
+BATCH_RATE_PER_SEC = 2.0
+BATCH_MAX_ITEMS = 500
+BATCH_HEADER_NAMES = {"numer", "numer oem", "oem", "tytul", "id", "czesc", "część"}
+# 🏷️ UZUPEŁNIANIE Z OFERTY - cena i tytuł pobierane w tle ze strony oferty (OSCAR_ENRICH=0 wyłącza)
+# Nieudane pobranie ponawiane po ENRICH_RETRY_BASE * 2^próba s (najwyżej ENRICH_RETRY_MAX), do ENRICH_MAX_ATTEMPTS prób
+ENRICH_ENABLED = os.environ.get("OSCAR_ENRICH", "1") != "0"
+ENRICH_DB_PATH = "enrich.db"
+ENRICH_WORKERS = 2
+ENRICH_RATE_PER_SEC = 1.0
+ENRICH_MAX_ATTEMPTS = 5
+ENRICH_RETRY_BASE = 30
+ENRICH_RETRY_MAX = 3600
+ENRICH_POLL_INTERVAL = 2.0
+SPRZEDAJEMY_OFFER_URL = os.environ.get("OSCAR_SPRZEDAJEMY_OFFER_URL", "https://sprzedajemy.pl")
+OFFER_LINK_RE = re.compile(r"^https?://(?:www\.)?sprzedajemy\.pl/[^?#]*-nr\d+")
+# Kwota z tekstu: tysiące oddzielone spacją / kropką / przecinkiem (zawsze tym samym, grupy po 3 cyfry),
+# na końcu najwyżej 2 cyfry groszy po innym separatorze; "1.299.00" czy "1,2345" nie pasują wcale
+PRICE_RE = re.compile(r"(?<![\d.,])(\d{1,3}(?:([.,\s])\d{3})(?:\2\d{3})*|\d+)(?:(?!\2)[.,](\d{1,2}))?(?![\d.,]*\d)")
+# ⏱️ PROFILOWANIE - włączane przez OSCAR_PROFILE=1, wyłączone kosztuje jedno sprawdzenie flagi
+PROFILE_ENABLED = os.environ.get("OSCAR_PROFILE", "0") == "1"
+PROFILE_RUNS = 50
+PROFILE_SAMPLES = 1000
+PROFILE_LOG_PATH = "profile.jsonl"
+PROFILE_METRICS_PATH = "metrics.prom"
+
+# ✅ JEDEN OBIEKT NA PROCES - zamiennik st.cache_resource, działa też bez Streamlita
+def shared_resource(fn):
+    lock = threading.Lock()
+    instance = []
+
+    @functools.wraps(fn)
+    def wrapper():
+        if not instance:
+            with lock:
+                if not instance:
+                    instance.append(fn())
+        return instance[0]
+
+    def clear():
+        with lock:
+            instance.clear()
+
+    wrapper.clear = clear
+    return wrapper
+
+# ⏱️ POMIAR ETAPÓW - podział czasu na przebieg skryptu + zbiorcze statystyki procesu
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+class Profiler:
+    def __init__(self):
+        self.runs = deque(maxlen=PROFILE_RUNS)
+        self._samples = {}
+        self._totals = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def start_run(self):
+        self._local.stages = {}
+        self._local.start = time.perf_counter()
+
+    def bind(self, fn):
+        # ✅ ZADANIA Z PULI WĄTKÓW LICZONE DO PRZEBIEGU, KTÓRY JE ZLECIŁ
+        stages = getattr(self._local, "stages", None)
+        def run(*args, **kwargs):
+            self._local.stages = stages
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._local.stages = None
+        return run
+
+    def record(self, stage, ms):
+        stages = getattr(self._local, "stages", None)
+        with self._lock:
+            if stages is not None:
+                stages[stage] = stages.get(stage, 0.0) + ms
+            self._samples.setdefault(stage, deque(maxlen=PROFILE_SAMPLES)).append(ms)
+            count, total = self._totals.get(stage, (0, 0.0))
+            self._totals[stage] = (count + 1, total + ms)
+
+    def finish_run(self):
+        stages = getattr(self._local, "stages", None)
+        if stages is None:
+            return
+        self._local.stages = None
+        total_ms = (time.perf_counter() - self._local.start) * 1000
+        self.record("rerun", total_ms)
+        run = {
+            "ts": datetime.now().isoformat(timespec="seconds"),
+            "total_ms": round(total_ms, 3),
+            "stages": {stage: round(ms, 3) for stage, ms in stages.items()},
+        }
+        with self._lock:
+            self.runs.append(run)
+        try:
+            with open(PROFILE_LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(run, ensure_ascii=False) + "\n")
+            self.write_metrics()
+        except OSError:
+            # ✅ BRAK ZAPISU STATYSTYK NIE PRZERYWA APLIKACJI
+            pass
+
+    def summary(self):
+        # Etap -> ostatni przebieg i percentyle z ostatnich PROFILE_RUNS przebiegów (ms)
+        with self._lock:
+            runs = list(self.runs)
+        rows = []
+        stages = {stage for run in runs for stage in run["stages"]}
+        for stage in sorted(stages) + ["rerun"]:
+            values = [run["total_ms"] if stage == "rerun" else run["stages"][stage]
+                      for run in runs if stage == "rerun" or stage in run["stages"]]
+            if not values:
+                continue
+            rows.append({
+                "etap": stage,
+                "ostatni_ms": values[-1],
+                "p50_ms": percentile(values, 50),
+                "p95_ms": percentile(values, 95),
+                "p99_ms": percentile(values, 99),
+                "przebiegi": len(values),
+            })
+        return rows
+
+    def write_metrics(self):
+        lines = [
+            "# HELP oscar_stage_duration_seconds Czas etapów OS-CAR (ostatnie pomiary).",
+            "# TYPE oscar_stage_duration_seconds summary",
+        ]
+        with self._lock:
+            snapshot = {stage: (list(samples), self._totals[stage]) for stage, samples in self._samples.items()}
+        for stage, (samples, (count, total)) in sorted(snapshot.items()):
+            for q in (0.5, 0.95, 0.99):
+                lines.append(f'oscar_stage_duration_seconds{{stage="{stage}",quantile="{q}"}} {percentile(samples, q * 100) / 1000:.6f}')
+            lines.append(f'oscar_stage_duration_seconds_sum{{stage="{stage}"}} {total / 1000:.6f}')
+            lines.append(f'oscar_stage_duration_seconds_count{{stage="{stage}"}} {count}')
+        tmp_path = f"{PROFILE_METRICS_PATH}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, PROFILE_METRICS_PATH)
+
+@shared_resource
+def get_profiler():
+    return Profiler()
+
+def record_stage(stage, start):
+    if PROFILE_ENABLED:
+        get_profiler().record(stage, (time.perf_counter() - start) * 1000)
+
+def profiled(stage):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not PROFILE_ENABLED:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record_stage(stage, start)
+        return wrapper
+    return decorator
+
+# ✅ BACKUP DANYCH - skompresowana kopia CSV, pomijana gdy treść się nie zmieniła
+# 🔒 BACKUP_LOCK - wątek kopii i hak zamknięcia nie piszą tego samego pliku jednocześnie
+BACKUP_LOCK = threading.Lock()
+
+@profiled("backup")
+def backup_data():
+    # 🔒 ODCZYT POD BLOKADĄ ZAPISU - migawka i dziennik z tej samej wersji (kompaktowanie nie wejdzie pomiędzy)
+    with storage_lock():
+        df = backup_frame()
+    content = df.to_csv(index=False).encode("utf-8")
+    digest = hashlib.sha256(content).hexdigest()[:16]
+    with BACKUP_LOCK:
+        os.makedirs(BACKUP_DIR, exist_ok=True)
+        if any(name.endswith(f"_{digest}.csv.gz") for name in os.listdir(BACKUP_DIR)):
+            return None
+        backup_name = f"baza_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{digest}.csv.gz"
+        tmp_path = os.path.join(BACKUP_DIR, f"{backup_name}.tmp")
+        with gzip.open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, os.path.join(BACKUP_DIR, backup_name))
+        prune_backups()
+    return backup_name
+
+def backup_frame():
+    # Baza + archiwum w jednej ramce; kolumna "archiwum" to miesiąc partycji (pusta dla ofert z bazy)
+    # ✅ KOPIA OBEJMUJE ARCHIWUM - przywrócenie odtwarza też partycje, oferty nie znikają ani się nie dublują
+    cache = get_archive_cache()
+    frames = [read_all()[COLUMNS].assign(archiwum="")]
+    frames += [cache.frame(month)[COLUMNS].assign(archiwum=month) for month in list_partitions()]
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+def list_backups():
+    if not os.path.isdir(BACKUP_DIR):
+        return []
+    backups = []
+    for name in os.listdir(BACKUP_DIR):
+        if not (name.startswith("baza_") and name.endswith(".csv.gz")):
+            continue
+        try:
+            created = datetime.strptime(name[5:20], "%Y%m%d_%H%M%S")
+        except ValueError:
+            continue
+        backups.append((name, created, os.path.getmtime(os.path.join(BACKUP_DIR, name))))
+    # ✅ KOPIE Z TEJ SAMEJ SEKUNDY (np. przy zamknięciu) - o kolejności decyduje czas zapisu pliku
+    backups.sort(key=lambda b: (b[1], b[2]), reverse=True)
+    return [(name, created) for name, created, _ in backups]
+
+def prune_backups(now=None):
+    now = now or datetime.now()
+    kept_buckets = set()
+    for i, (name, created) in enumerate(list_backups()):
+        age = now - created
+        if age <= BACKUP_HOURLY_FOR:
+            bucket = created.strftime("%Y%m%d%H")
+        elif age <= BACKUP_DAILY_FOR:
+            bucket = created.strftime("%Y%m%d")
+        else:
+            bucket = None
+        # ✅ NAJNOWSZA KOPIA ZAWSZE ZOSTAJE
+        if i == 0 or (bucket is not None and bucket not in kept_buckets):
+            kept_buckets.add(bucket)
+            continue
+        os.remove(os.path.join(BACKUP_DIR, name))
+
+def restore_backup(name):
+    with gzip.open(os.path.join(BACKUP_DIR, os.path.basename(name)), "rb") as f:
+        df = pd.read_csv(BytesIO(f.read()), dtype=str)
+    with storage_lock():
+        if "archiwum" not in df.columns:
+            # ✅ STARA KOPIA (BEZ ARCHIWUM) - oferty, które są już w archiwum, nie wracają do bazy
+            if list_partitions():
+                df = df[~df["id"].isin(load_archive()["id"])]
+            save_data(df)
+            return len(df)
+        archived = df["archiwum"].notna().to_numpy()
+        months = set()
+        os.makedirs(ARCHIVE_DIR, exist_ok=True)
+        for month, rows in df[archived].groupby("archiwum"):
+            months.add(month)
+            write_partition(month, add_derived_columns(rows[COLUMNS].reset_index(drop=True)))
+        # ✅ ARCHIWUM JAK W CHWILI KOPII - miesiące zarchiwizowane później wracają razem z bazą
+        for month in set(list_partitions()) - months:
+            os.remove(partition_path(month))
+        save_data(df.loc[~archived, COLUMNS].reset_index(drop=True))
+    return len(df)
+
+# 🧵 BACKUP W TLE - zapis nie czeka na kopię, kolejne żądania są łączone w jedno
+class BackupWorker:
+    def __init__(self):
+        self._pending = threading.Event()
+        self._requests = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="oscar-backup", daemon=True)
+        self._thread.start()
+
+    def request(self):
+        if not self._pending.is_set():
+            self._pending.set()
+            self._requests.put(True)
+
+    def _run(self):
+        last_run = 0.0
+        while True:
+            self._requests.get()
+            # ✅ NAJWYŻEJ JEDNA KOPIA NA BACKUP_MIN_INTERVAL - seria edycji daje jedną kopię
+            time.sleep(max(0.0, last_run + BACKUP_MIN_INTERVAL - time.monotonic()))
+            last_run = time.monotonic()
+            self._pending.clear()
+            try:
+                backup_data()
+            except Exception as e:
+                print(f"Backup nieudany: {e}")
+
+@shared_resource
+def get_backup_worker():
+    return BackupWorker()
+
+# Czy proces coś zapisał (kopia przy zamknięciu) / czy trwa zamknięcie (bez nowych zadań dla wątku kopii)
+_backup_requested = threading.Event()
+_shutting_down = threading.Event()
+
+def request_backup():
+    _backup_requested.set()
+    if not _shutting_down.is_set():
+        get_backup_worker().request()
+
+def read_snapshot():
+    if not os.path.exists(CSV_PATH):
+        return pd.DataFrame(columns=COLUMNS, dtype=str)
+    df = pd.read_csv(CSV_PATH, dtype=str)
+    # ✅ USUWANIE 'nan' Z PUSTYCH PÓL
+    df = df.replace('nan', '').fillna('')
+    return df
+
+def write_snapshot(df):
+    # ✅ USUWANIE 'nan' PRZED ZAPISEM
+    df = df.reindex(columns=COLUMNS).replace('nan', '').fillna('')
+    # ✅ ZAPIS ATOMOWY - przerwany zapis nie zostawi uciętego pliku
+    tmp_path = f"{CSV_PATH}.tmp"
+    df.to_csv(tmp_path, index=False, encoding="utf-8")
+    os.replace(tmp_path, CSV_PATH)
+
+# 📒 DZIENNIK ZMIAN - każda zmiana to jedna linia JSON dopisana na końcu pliku
+def append_journal(record):
+    line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+    with open(JOURNAL_PATH, "ab+") as f:
+        # ✅ UCIĘTA OSTATNIA LINIA (np. po awarii) - nowy wpis zaczynamy od nowej linii
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                line = b"\n" + line
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+
+def read_journal_records(offset=0):
+    # ✅ TYLKO PEŁNE LINIE - wpis w trakcie zapisu zostanie odczytany następnym razem
+    if not os.path.exists(JOURNAL_PATH):
+        return [], 0
+    with open(JOURNAL_PATH, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n") + 1
+    records = []
+    for line in data[:end].splitlines():
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            # ✅ USZKODZONA LINIA (np. po awarii) - pomijamy
+            continue
+    return records, offset + end
+
+def replay_journal(df):
+    records, _ = read_journal_records()
+    return replay_records(df, records)
+
+def replay_records(df, records):
+    if not records:
+        return df
+    # ✅ WIERSZE JAKO LISTY Z KOLUMN (.tolist) - dużo szybsze niż to_dict("records")
+    rows = [list(row) for row in zip(*(df[col].tolist() for col in COLUMNS))]
+    col_pos = {col: i for i, col in enumerate(COLUMNS)}
+    positions = {row[0]: pos for pos, row in enumerate(rows)}
+    for record in records:
+        op = record.get("op")
+        if op == "insert":
+            row = [record["row"].get(col, "") for col in COLUMNS]
+            positions[row[0]] = len(rows)
+            rows.append(row)
+        elif op == "update":
+            pos = positions.get(record["id"])
+            if pos is not None and rows[pos] is not None and record["column"] in col_pos:
+                rows[pos][col_pos[record["column"]]] = record["value"]
+        elif op == "delete":
+            pos = positions.pop(record["id"], None)
+            if pos is not None:
+                rows[pos] = None
+    rows = [row for row in rows if row is not None]
+    return pd.DataFrame(rows, columns=COLUMNS, dtype=str) if rows else pd.DataFrame(columns=COLUMNS, dtype=str)
+
+def compact_journal():
+    with storage_lock():
+        df = replay_journal(read_snapshot())
+        write_snapshot(df)
+        if os.path.exists(JOURNAL_PATH):
+            os.remove(JOURNAL_PATH)
+
+def maybe_compact_journal():
+    if os.path.exists(JOURNAL_PATH) and os.path.getsize(JOURNAL_PATH) >= JOURNAL_COMPACT_BYTES:
+        compact_journal()
+
+# 🗄️ SQLITE - jedno połączenie na proces (WAL), dostęp chroniony blokadą
+# ✅ KOLEJNOŚĆ BLOKAD ZAWSZE storage_lock() -> DB_LOCK - get_db() wołamy przed wzięciem DB_LOCK
+DB_LOCK = threading.RLock()
+_db_migrated = threading.Event()
+
+@shared_resource
+def open_db():
+    # ✅ TYLKO POŁĄCZENIE I SCHEMAT - bez blokad aplikacji pod blokadą inicjalizacji
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    with conn:
+        columns_sql = ", ".join(f"{col} TEXT NOT NULL DEFAULT ''" for col in COLUMNS)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS baza ({columns_sql})")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_baza_id ON baza(id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_baza_dodano ON baza(dodano)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_baza_tytul ON baza(tytul)")
+    return conn
+
+def get_db():
+    conn = open_db()
+    if not _db_migrated.is_set():
+        # ✅ JEDNORAZOWA MIGRACJA Z CSV (i dziennika) - blokada pliku: dwa procesy nie zrobią jej jednocześnie
+        with storage_lock(), DB_LOCK, conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] == 0:
+                migrated = replay_journal(read_snapshot())
+                db_insert_rows(conn, migrated.to_dict("records"))
+                conn.execute("PRAGMA user_version = 1")
+        _db_migrated.set()
+    return conn
+
+def clear_db():
+    open_db.clear()
+    _db_migrated.clear()
+
+def prepare_storage():
+    # 🚀 JEDNORAZOWE MIGRACJE TRYBU ZAPISU (CSV -> SQLite / Arrow, stare kolumny pochodne) - wołane przy starcie
+    # i przed blokadą cache danych; później to tylko sprawdzenie flagi / schematu pliku
+    if STORAGE_MODE == "sqlite":
+        get_db()
+    elif STORAGE_MODE == "arrow":
+        migrate_arrow()
+
+get_db.clear = clear_db
+
+@contextmanager
+def db_transaction():
+    conn = get_db()
+    with DB_LOCK, conn:
+        yield conn
+
+def db_insert_rows(conn, rows):
+    placeholders = ", ".join("?" for _ in COLUMNS)
+    conn.executemany(
+        f"INSERT INTO baza ({', '.join(COLUMNS)}) VALUES ({placeholders})",
+        [tuple(str(row.get(col, "")) for col in COLUMNS) for row in rows],
+    )
+
+def db_query(sql, params=()):
+    conn = get_db()
+    with DB_LOCK:
+        return pd.read_sql_query(sql, conn, params=params)
+
+# 🏹 ARROW - kolumny typowane (dodano_dt, cena_num, kategorie platform/status) razem z pochodnymi,
+# odczyt przez mapowanie pamięci: wczytanie bazy to brak parsowania, a nieużyte kolumny nie są czytane z dysku
+def migrate_arrow():
+    # Sprawdzenie to tylko schemat pliku - migracje biorą storage_lock() dopiero, gdy są potrzebne
+    if os.path.exists(ARROW_PATH) and derived_current(arrow_reader().schema):
+        return
+    with storage_lock():
+        if not os.path.exists(ARROW_PATH):
+            # ✅ JEDNORAZOWA MIGRACJA Z CSV (i dziennika, jeśli istnieje)
+            write_arrow(frame_to_arrow(add_derived_columns(replay_journal(read_snapshot()))))
+            return
+        table = open_arrow()
+        if not derived_current(table.schema):
+            # ✅ KOLUMNY POCHODNE WEDŁUG STARSZYCH REGUŁ - przeliczane i zapisywane raz
+            write_arrow(frame_to_arrow(add_derived_columns(arrow_to_frame(table.select(COLUMNS), categorical=False))))
+
+def read_arrow(columns=None):
+    migrate_arrow()
+    table = open_arrow()
+    return table if columns is None else table.select(columns)
+
+def arrow_reader():
+    source = pa.memory_map(ARROW_PATH) if ARROW_MMAP else pa.OSFile(ARROW_PATH)
+    return pa.ipc.open_file(source)
+
+def open_arrow():
+    return arrow_reader().read_all()
+
+def derived_current(schema):
+    return (schema.metadata or {}).get(b"derived") == DERIVED_VERSION.encode()
+
+def arrow_to_frame(table, categorical=True):
+    if not categorical:
+        # ✅ RAMKA DO EDYCJI - status jako zwykły tekst, żeby przyjął każdą nową wartość
+        for i, field in enumerate(table.schema):
+            if field.name in COLUMNS and pa.types.is_dictionary(field.type):
+                table = table.set_column(i, field.name, table[i].cast(field.type.value_type))
+    return table.to_pandas()
+
+def read_arrow_frame(columns=None, categorical=True):
+    return arrow_to_frame(read_arrow(columns), categorical)
+
+# ✅ STAŁY SCHEMAT PLIKU - typy nie zależą od pierwszej partii danych (pusta baza, połączone kategorie po edycji)
+ARROW_SCHEMA = pa.schema(
+    [(col, pa.dictionary(pa.int32(), pa.large_string()) if col == "status" else pa.large_string()) for col in COLUMNS]
+    + [
+        ("platform", pa.dictionary(pa.int8(), pa.large_string())),
+        ("dodano_dt", pa.timestamp("us")),
+        ("cena_num", pa.float64()),
+        ("short_title", pa.large_string()),
+        ("part_key", pa.large_string()),
+        ("link_key", pa.large_string()),
+    ],
+    metadata={"derived": DERIVED_VERSION},
+)
+
+def frame_to_arrow(df):
+    # df z kolumnami pochodnymi (add_derived_columns)
+    # ✅ PLATFORMA ZAWSZE Z KATEGORIAMI PLATFORMS - po pd.concat różnych kategorii byłaby zwykłym tekstem
+    df = df.assign(platform=pd.Categorical(df["platform"].astype(object), categories=PLATFORMS))
+    table = pa.Table.from_pandas(df[ARROW_SCHEMA.names], preserve_index=False)
+    columns = []
+    for field in ARROW_SCHEMA:
+        column = table[field.name]
+        if pa.types.is_dictionary(field.type) and not pa.types.is_dictionary(column.type):
+            column = pc.dictionary_encode(column.cast(field.type.value_type))
+        columns.append(column.cast(field.type))
+    return pa.Table.from_arrays(columns, schema=ARROW_SCHEMA).unify_dictionaries().combine_chunks()
+
+def write_arrow(table, path=ARROW_PATH, compression=None):
+    # ✅ ZAPIS ATOMOWY - zmapowany stary plik zostaje ważny do końca odczytu
+    tmp_path = f"{path}.tmp"
+    options = pa.ipc.IpcWriteOptions(compression=compression)
+    with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+
+def write_arrow_records(df, records):
+    # ✅ TE SAME WPISY CO W DZIENNIKU - kolumny pochodne liczone tylko dla zmienionych wierszy
+    before = file_signature(ARROW_PATH)
+    write_arrow(frame_to_arrow(apply_journal_records(df, records)))
+    get_data_cache().note_write(before, file_signature(ARROW_PATH), record_ids(records))
+
+def export_csv(path=None):
+    # ✅ CAŁA HISTORIA - razem z zarchiwizowanymi miesiącami
+    df = with_archive([load_data()], load_archive())[COLUMNS]
+    if path is None:
+        return df.to_csv(index=False).encode("utf-8")
+    df.to_csv(path, index=False, encoding="utf-8")
+    return path
+
+def read_all():
+    if STORAGE_MODE == "sqlite":
+        return db_query(f"SELECT {', '.join(COLUMNS)} FROM baza ORDER BY rowid")
+    if STORAGE_MODE == "arrow":
+        return read_arrow_frame(COLUMNS, categorical=False)
+    df = read_snapshot()
+    if STORAGE_MODE == "journal":
+        df = replay_journal(df)
+    return df
+
+# 🧮 KOLUMNY POCHODNE - liczone raz, wektorowo, zamiast w pętli renderowania
+def add_derived_columns(df):
+    df = df.copy()
+    ids = df["id"].astype(str).str.lower()
+    links = df["link"].astype(str).str.lower()
+    # ✅ KOLEJNOŚĆ JAK W DAWNYM if/elif - ostatnia maska ma pierwszeństwo
+    platform = pd.Series("Sprzedajemy.pl", index=df.index)
+    platform = platform.mask(ids.str.contains("manual", regex=False), "Ręczna")
+    platform = platform.mask(ids.str.contains("sprzedajemy", regex=False), "Sprzedajemy.pl")
+    platform = platform.mask(ids.str.contains("allegro", regex=False) | links.str.contains("allegro", regex=False), "Allegro")
+    df["platform"] = pd.Categorical(platform, categories=PLATFORMS)
+    df["dodano_dt"] = pd.to_datetime(df["dodano"], format=DODANO_FORMAT, errors="coerce")
+    df["cena_num"] = price_numbers(df["cena"], df.index)
+    tytul = df["tytul"].astype(str)
+    df["short_title"] = tytul.where(tytul.str.len() <= SHORT_TITLE_LEN, tytul.str[:SHORT_TITLE_LEN] + "...")
+    # ✅ KLUCZE DUPLIKATÓW - te same reguły co normalize_part / canonical_url
+    df["part_key"] = pd.Series([part_key(title) for title in tytul.tolist()], index=df.index, dtype=tytul.dtype)
+    df["link_key"] = links.str.strip().str.replace(URL_PREFIX_RE, "", regex=True).str.replace(URL_SUFFIX_RE, "", regex=True)
+    return df
+
+def price_numbers(values, index):
+    # Kwoty według reguł parse_price (PRICE_RE), wektorowo: "1.299,00 zł" -> 1299.0, "ok. 50 zł" -> 50.0, bez kwoty -> NaN
+    # ✅ KAŻDY RÓŻNY ZAPIS CENY PARSOWANY RAZ - ceny w bazie często się powtarzają
+    codes, uniques = pd.factorize(values.astype(str))
+    parts = pd.Series(uniques, dtype=object).str.extract(PRICE_RE)
+    amounts = pd.to_numeric(parts[0].str.replace(r"[.,\s]", "", regex=True) + "." + parts[2].fillna("0"), errors="coerce")
+    # ✅ BRAK WARTOŚCI (kod -1) TRAFIA NA DOPISANE NaN NA KOŃCU
+    return pd.Series(np.append(amounts.to_numpy(dtype=float), np.nan)[codes], index=index)
+
+def combine_chunks(df):
+    # ✅ KOLUMNY TEKSTOWE (Arrow) W JEDNYM KAWAŁKU - take() na kilku kawałkach skleja całą kolumnę,
+    # więc pobranie jednej strony kosztowałoby tyle, co cała baza
+    for column in df.columns:
+        values = df[column].array
+        if isinstance(values, pd.arrays.ArrowStringArray):
+            chunked = values.__arrow_array__()
+            if chunked.num_chunks > 1:
+                df[column] = pd.Series(chunked.combine_chunks(), dtype=df[column].dtype, index=df.index)
+    return df
+
+def apply_journal_records(df, records):
+    # ✅ DOPISANE WPISY DZIENNIKA NAKŁADANE NA WCZYTANĄ RAMKĘ - bez ponownego czytania bazy
+    df = df.copy(deep=False)
+    inserted, touched, owned = [], set(), set()
+
+    def own(column):
+        # 🔒 KOLUMNA KOPIOWANA PRZED PIERWSZĄ ZMIANĄ - płytka kopia dzieli dane z ramką z cache,
+        # a bez Copy-on-Write (pandas < 3) .loc zmieniłoby ramkę widzianą przez wszystkie sesje
+        if column not in owned:
+            df[column] = df[column].copy()
+            owned.add(column)
+    for record in records:
+        op = record.get("op")
+        if op == "insert":
+            inserted.append({col: record["row"].get(col, "") for col in COLUMNS})
+            continue
+        if inserted:
+            df = pd.concat([df, add_derived_columns(pd.DataFrame(inserted, columns=COLUMNS, dtype=str))], ignore_index=True)
+            inserted = []
+        if op == "update":
+            own(record["column"])
+            df.loc[df["id"] == record["id"], record["column"]] = record["value"]
+            # ✅ EDYCJA NOTATKI NIE ZMIENIA KOLUMN POCHODNYCH
+            if record["column"] in DERIVED_SOURCES:
+                touched.add(record["id"])
+        elif op == "delete":
+            df = df[df["id"] != record["id"]].reset_index(drop=True)
+            touched.discard(record["id"])
+    if inserted:
+        df = pd.concat([df, add_derived_columns(pd.DataFrame(inserted, columns=COLUMNS, dtype=str))], ignore_index=True)
+    if touched:
+        mask = df["id"].isin(touched)
+        derived = add_derived_columns(df.loc[mask, COLUMNS])
+        for column in derived.columns.difference(COLUMNS):
+            own(column)
+            df.loc[mask, column] = derived[column]
+    return df
+
+def record_ids(records):
+    ids = set()
+    for record in records:
+        if record.get("op") == "insert":
+            ids.add(record["row"]["id"])
+            continue
+        ids.add(record["id"])
+        if record.get("column") == "id":
+            # ✅ ZMIANA id - wiersz znika pod starym id i pojawia się pod nowym
+            ids.add(record["value"])
+    return ids
+
+def file_signature(path):
+    try:
+        info = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (info.st_mtime_ns, info.st_size, info.st_ino)
+
+# ⚡ OPTYMALIZACJA - cache dla danych (razem z kolumnami pochodnymi), wspólny dla sesji
+# Ważny tak długo, jak (mtime, rozmiar, inode) pliku / PRAGMA data_version się nie zmienią.
+# Każda nowa ramka trafia do historii razem ze zbiorem id zmienionych wierszy (None = pełne wczytanie).
+class DataCache:
+    def __init__(self):
+        self.generation = 0
+        self._key = None
+        self._df = None
+        self._journal_offset = 0
+        self._journal_inode = None
+        self._history = deque(maxlen=DATA_HISTORY)
+        self._writes = []
+        self._orders = {}
+        self._lock = threading.Lock()
+
+    def note_write(self, before, after, ids):
+        # ✅ WŁASNY ZAPIS PLIKU ARROW - podpis pliku przed / po i id zmienionych wierszy
+        with self._lock:
+            self._writes.append((before, after, ids))
+
+    def _written_since(self, signature, current):
+        # ✅ ŁAŃCUCH WŁASNYCH ZAPISÓW OD WCZYTANEJ WERSJI - zapis innego procesu go przerywa (None)
+        ids, writes, self._writes = set(), self._writes, []
+        for before, after, written in writes:
+            if signature is not None and before == signature:
+                ids |= written
+                signature = after
+        return ids if signature is not None and signature == current else None
+
+    def _remember(self, df, ids):
+        # ✅ SŁABA REFERENCJA - historia nie trzyma starych ramek w pamięci
+        self._history.append((weakref.ref(df), ids))
+
+    def changes_since(self, old_df, new_df):
+        # Zbiór id wierszy zmienionych między dwiema ramkami z cache albo None, gdy trzeba porównać wszystko
+        with self._lock:
+            ids, found = set(), False
+            for ref, changed in self._history:
+                if not found:
+                    found = ref() is old_df
+                    continue
+                if changed is None:
+                    return None
+                ids |= changed
+                if ref() is new_df:
+                    return ids
+            return None
+
+    def sort_order(self, df, column, ascending):
+        # ✅ KOLEJNOŚĆ LICZONA RAZ NA WERSJĘ RAMKI I OPCJĘ SORTOWANIA - odświeżenie strony tylko ją tnie
+        key = (column, ascending)
+        with self._lock:
+            cached = self._orders.get(key)
+            if cached is not None and cached[0]() is df:
+                return cached[1]
+        order = df[column].reset_index(drop=True).sort_values(ascending=ascending, kind="stable").index.to_numpy()
+        with self._lock:
+            self._orders[key] = (weakref.ref(df), order)
+        return order
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._key = None
+
+    def _signature(self):
+        if STORAGE_MODE == "sqlite":
+            conn = get_db()
+            with DB_LOCK:
+                data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            return ("sqlite", self.generation, data_version)
+        if STORAGE_MODE == "journal":
+            # ✅ BEZ generation - własne dopisania do dziennika nakładamy przyrostowo
+            return ("journal", file_signature(CSV_PATH))
+        if STORAGE_MODE == "arrow":
+            return ("arrow", self.generation, file_signature(ARROW_PATH))
+        return ("csv", self.generation, file_signature(CSV_PATH))
+
+    def get(self):
+        # 🔒 MIGRACJE PRZED BLOKADĄ CACHE - biorą storage_lock(), a zapisujący trzymają storage_lock()
+        # i dopiero potem biorą blokadę cache (note_write / invalidate_data)
+        prepare_storage()
+        with self._lock:
+            key = self._signature()
+            if key == self._key:
+                if STORAGE_MODE != "journal":
+                    return self._df
+                journal = file_signature(JOURNAL_PATH)
+                if journal is None and self._journal_inode is None:
+                    return self._df
+                # ✅ TEN SAM DZIENNIK (lub nowo założony) - dokładamy tylko nowe wpisy
+                if journal is not None and self._journal_inode in (None, journal[2]) and journal[1] >= self._journal_offset:
+                    if journal[1] > self._journal_offset:
+                        records, self._journal_offset = read_journal_records(self._journal_offset)
+                        if records:
+                            self._df = combine_chunks(apply_journal_records(self._df, records))
+                            self._remember(self._df, record_ids(records))
+                    self._journal_inode = journal[2]
+                    return self._df
+            changed = None
+            if STORAGE_MODE == "journal":
+                journal = file_signature(JOURNAL_PATH)
+                self._journal_inode = journal[2] if journal else None
+                records, self._journal_offset = read_journal_records()
+                df = replay_records(read_snapshot(), records)
+            elif STORAGE_MODE == "arrow":
+                df = read_arrow_frame()
+                changed = self._written_since(self._key[2] if self._key else None, key[2])
+            else:
+                df = read_all()
+            # ✅ W TRYBIE "arrow" KOLUMNY POCHODNE SĄ JUŻ W PLIKU - bez parsowania i ponownego liczenia
+            self._df = df if STORAGE_MODE == "arrow" else combine_chunks(add_derived_columns(df))
+            self._key = key
+            self._remember(self._df, changed)
+            return self._df
+
+@shared_resource
+def get_data_cache():
+    return DataCache()
+
+@profiled("load_data")
+def load_data():
+    # ✅ RAMKA WSPÓLNA DLA WSZYSTKICH SESJI - tylko do odczytu
+    return get_data_cache().get()
+
+def invalidate_data():
+    get_data_cache().invalidate()
+
+def data_changes(old_df, new_df):
+    return get_data_cache().changes_since(old_df, new_df)
+
+# 🧊 PARTYCJE MIESIĘCZNE - baza trzyma ostatnie miesiące, starsze leżą w archive/baza_RRRR-MM.arrow
+# (Arrow IPC z kompresją zstd, tylko do odczytu) i są wczytywane dopiero, gdy strona, sortowanie lub wyszukiwanie do nich sięga
+def partition_path(month):
+    return os.path.join(ARCHIVE_DIR, f"baza_{month}.arrow")
+
+def list_partitions():
+    # Zarchiwizowane miesiące (RRRR-MM), od najstarszego
+    if not os.path.isdir(ARCHIVE_DIR):
+        return []
+    return sorted(name[5:12] for name in os.listdir(ARCHIVE_DIR)
+                  if name.startswith("baza_") and name.endswith(".arrow") and len(name) == 18)
+
+def read_partition(month):
+    table = pa.ipc.open_file(partition_path(month)).read_all()
+    df = table.to_pandas()
+    # ✅ PARTYCJA SPRZED ZMIANY REGUŁ (tylko do odczytu) - kolumny pochodne przeliczane w pamięci
+    return df if derived_current(table.schema) else add_derived_columns(df[COLUMNS])
+
+def write_partition(month, df):
+    # ✅ LICZBA WIERSZY W METADANYCH - licznik panelu bez rozpakowywania pliku
+    table = frame_to_arrow(df)
+    table = table.replace_schema_metadata({"derived": DERIVED_VERSION, "rows": str(table.num_rows)})
+    write_arrow(table, partition_path(month), compression=ARCHIVE_COMPRESSION)
+
+def with_archive(frames, archive=None):
+    # Ramki bazy + archiwum w jednej; kolumna "archiwum" oznacza wiersze tylko do odczytu
+    frames = frames + ([archive] if archive is not None else [])
+    if len(frames) == 1:
+        return frames[0]
+    df = pd.concat(frames, ignore_index=True)
+    if "archiwum" in df:
+        df["archiwum"] = df["archiwum"].eq(True)
+    return df
+
+class ArchiveCache:
+    def __init__(self):
+        self._frames = {}
+        self._rows = {}
+        self._archive = (None, None)
+        self._lock = threading.RLock()
+
+    def rows(self, month):
+        signature = file_signature(partition_path(month))
+        with self._lock:
+            cached = self._rows.get(month)
+            if cached is None or cached[0] != signature:
+                metadata = pa.ipc.open_file(partition_path(month)).schema.metadata
+                cached = (signature, int(metadata[b"rows"]))
+                self._rows[month] = cached
+            return cached[1]
+
+    def frame(self, month):
+        signature = file_signature(partition_path(month))
+        with self._lock:
+            cached = self._frames.get(month)
+            if cached is None or cached[0] != signature:
+                df = read_partition(month)
+                df["archiwum"] = True
+                cached = (signature, df)
+                self._frames[month] = cached
+            return cached[1]
+
+    def all(self):
+        # ✅ RAMKA CAŁEGO ARCHIWUM - ten sam obiekt, dopóki pliki się nie zmienią (indeksy go nie przeliczają)
+        months = list_partitions()
+        key = tuple((month, file_signature(partition_path(month))) for month in months)
+        with self._lock:
+            if self._archive[0] != key:
+                df = pd.concat([self.frame(month) for month in months], ignore_index=True) if months else None
+                self._archive = (key, df)
+            return self._archive[1]
+
+    def clear(self):
+        with self._lock:
+            self._frames, self._rows, self._archive = {}, {}, (None, None)
+
+@shared_resource
+def get_archive_cache():
+    return ArchiveCache()
+
+@profiled("load_archive")
+def load_archive():
+    # Całe archiwum (None, gdy puste) - czytane z dysku tylko raz
+    return get_archive_cache().all()
+
+def archived_rows():
+    cache = get_archive_cache()
+    return sum(cache.rows(month) for month in list_partitions())
+
+def archive_partitions(keep_months=ARCHIVE_KEEP_MONTHS, now=None):
+    # Przenosi oferty starsze niż keep_months ostatnich miesięcy do archiwum; zwraca {miesiąc: przeniesione wiersze}
+    now = now or datetime.now()
+    first_kept = now.year * 12 + now.month - max(keep_months, 1)
+    cutoff = datetime(first_kept // 12, first_kept % 12 + 1, 1)
+    # ✅ NAJPIERW ZAPIS BUFORA - edycje starych ofert trafiają do archiwum razem z nimi
+    get_write_buffer().flush()
+    with storage_lock():
+        df = add_derived_columns(read_all())
+        # ✅ OFERTY BEZ POPRAWNEJ DATY ZOSTAJĄ W BAZIE
+        old = (df["dodano_dt"] < cutoff).to_numpy()
+        if not old.any():
+            return {}
+        months = df.loc[old, "dodano_dt"].to_numpy().astype("datetime64[M]").astype(str)
+        archived = {}
+        os.makedirs(ARCHIVE_DIR, exist_ok=True)
+        for month, rows in df[old].groupby(months):
+            archived[month] = len(rows)
+            if os.path.exists(partition_path(month)):
+                # ✅ PONOWIONA ARCHIWIZACJA (np. po przerwanym zapisie) NIE DUBLUJE WIERSZY
+                rows = pd.concat([read_partition(month), rows], ignore_index=True).drop_duplicates(subset=COLUMNS)
+            write_partition(month, rows)
+        save_data(df.loc[~old, COLUMNS].reset_index(drop=True))
+    return archived
+
+# 📊 ZAPYTANIA DLA PANELU - w trybie "sqlite" idą po indeksach zamiast po całej ramce
+def count_rows():
+    return count_recent() + archived_rows()
+
+def count_recent():
+    if STORAGE_MODE == "sqlite":
+        conn = get_db()
+        with DB_LOCK:
+            return conn.execute("SELECT COUNT(*) FROM baza").fetchone()[0]
+    if STORAGE_MODE == "arrow":
+        return read_arrow(["id"]).num_rows
+    return len(load_data())
+
+def last_added():
+    if STORAGE_MODE == "sqlite":
+        conn = get_db()
+        with DB_LOCK:
+            return conn.execute("SELECT MAX(dodano) FROM baza").fetchone()[0] or ""
+    if STORAGE_MODE == "arrow":
+        table = read_arrow(["dodano_dt", "dodano"])
+        newest = pc.max(table["dodano_dt"]).as_py()
+        return newest.strftime(DODANO_FORMAT) if newest is not None else pc.max(table["dodano"]).as_py() or ""
+    df = load_data()
+    if df.empty:
+        return ""
+    newest = df["dodano_dt"].max()
+    return newest.strftime(DODANO_FORMAT) if pd.notna(newest) else df["dodano"].max()
+
+@profiled("load_sorted")
+def load_sorted(sort_option, limit=None, offset=0, df=None):
+    months = list_partitions() if df is None else []
+    if not months:
+        return sort_page(sort_option, limit, offset, df)
+    column, ascending = SORT_OPTIONS[sort_option]
+    if column != "dodano":
+        # ✅ SORTOWANIE PO TYTULE - potrzebna cała historia
+        return sort_page(sort_option, limit, offset, with_archive([load_data()], load_archive()))
+    # ✅ PO DACIE: baza, potem miesiące archiwum w kolejności sortowania - wczytujemy tylko te, do których sięga strona
+    segments = [(None, count_recent())] + [(month, get_archive_cache().rows(month)) for month in reversed(months)]
+    if ascending:
+        segments.reverse()
+    pages, skip, remaining = [], offset, limit
+    for month, rows in segments:
+        if skip >= rows:
+            skip -= rows
+            continue
+        if month is None:
+            page = sort_page(sort_option, remaining, skip)
+        else:
+            page = sort_page(sort_option, remaining, skip, get_archive_cache().frame(month))
+        pages.append(page)
+        skip = 0
+        if remaining is not None:
+            remaining -= len(page)
+            if remaining <= 0:
+                break
+    return with_archive(pages) if pages else sort_page(sort_option, 0)
+
+def sort_page(sort_option, limit=None, offset=0, df=None):
+    column, ascending = SORT_OPTIONS[sort_option]
+    if STORAGE_MODE == "sqlite" and df is None:
+        direction = "ASC" if ascending else "DESC"
+        sql = f"SELECT {', '.join(COLUMNS)} FROM baza ORDER BY {column} {direction}, rowid {direction}"
+        params = ()
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params = (limit, offset)
+        return add_derived_columns(db_query(sql, params))
+    sort_column = "dodano_dt" if column == "dodano" else column
+    if STORAGE_MODE == "arrow" and df is None:
+        # ✅ SORTOWANIE PO JEDNEJ KOLUMNIE, DO PANDAS TRAFIA TYLKO BIEŻĄCA STRONA
+        table = read_arrow()
+        order = pc.sort_indices(table, sort_keys=[(sort_column, "ascending" if ascending else "descending")])
+        if limit is not None:
+            order = order[offset:offset + limit]
+        return table.take(order).to_pandas()
+    if df is not None:
+        df = df.sort_values(sort_column, ascending=ascending)
+        return df if limit is None else df.iloc[offset:offset + limit]
+    df = load_data()
+    order = get_data_cache().sort_order(df, sort_column, ascending)
+    return df.iloc[order if limit is None else order[offset:offset + limit]]
+
+# 🔎 INDEKS ODWROTNY - numery OEM w każdej pisowni (5J0 853 661 / 5J0853661 / 5j0-853-661)
+def tokenize(text, query=False):
+    words = TOKEN_RE.findall(str(text).lower())
+    tokens, run = set(), []
+    for word in words + [""]:
+        # ✅ TOKEN TO TYLKO LITERY I CYFRY - "nie same litery" znaczy "zawiera cyfrę" (bez pętli po znakach)
+        if word and not word.isalpha():
+            run.append(word)
+            continue
+        if run:
+            # ✅ SĄSIEDNIE CZĘŚCI NUMERU SKLEJONE W JEDEN TOKEN
+            tokens.add("".join(run))
+            if not query:
+                tokens.update(run)
+            run = []
+        if word:
+            tokens.add(word)
+    return tokens
+
+def index_texts(df):
+    texts = df[INDEX_COLUMNS[0]].astype(str)
+    for column in INDEX_COLUMNS[1:]:
+        texts = texts + " " + df[column].astype(str)
+    return texts.tolist()
+
+class SearchIndex:
+    def __init__(self):
+        self._postings = {}
+        self._row_tokens = {}
+        self._sorted_tokens = []
+        self._hashes = None
+        self._synced_df = None
+        self._lock = threading.Lock()
+
+    def _add(self, row_id, tokens, bulk=False):
+        self._row_tokens[row_id] = tokens
+        for token in tokens:
+            ids = self._postings.get(token)
+            if ids is None:
+                self._postings[token] = ids = set()
+                if not bulk:
+                    bisect.insort(self._sorted_tokens, token)
+            ids.add(row_id)
+
+    def _remove(self, row_id, bulk=False):
+        for token in self._row_tokens.pop(row_id, ()):
+            ids = self._postings[token]
+            ids.discard(row_id)
+            if not ids:
+                del self._postings[token]
+                if not bulk:
+                    del self._sorted_tokens[bisect.bisect_left(self._sorted_tokens, token)]
+
+    def _reindex(self, row_ids, texts, bulk=False):
+        for row_id, text in zip(row_ids, texts):
+            self._remove(row_id, bulk=bulk)
+            self._add(row_id, tokenize(text), bulk=bulk)
+
+    def sync(self, df):
+        # ✅ TA SAMA RAMKA Z CACHE - nic się nie zmieniło
+        if df is self._synced_df:
+            return
+        with self._lock:
+            if df is self._synced_df:
+                return
+            changed = data_changes(self._synced_df, df) if self._synced_df is not None else None
+            if changed is not None:
+                # ✅ ZMIANY ZNANE Z WPISÓW (dziennik / własny zapis Arrow) - tylko te wiersze, bez haszowania całej bazy
+                rows = df[df["id"].isin(changed)]
+                hashes = dict(zip(rows["id"].tolist(), pd.util.hash_pandas_object(rows[INDEX_COLUMNS], index=False).tolist()))
+                for row_id in changed.difference(hashes):
+                    self._remove(row_id)
+                    self._hashes.pop(row_id, None)
+                self._reindex(rows["id"].tolist(), index_texts(rows))
+                self._hashes.update(hashes)
+                self._synced_df = df
+                return
+            # ✅ PEŁNE WCZYTANIE (zmiana spoza procesu) - porównanie skrótów wszystkich wierszy
+            row_ids = df["id"].tolist()
+            hashes = dict(zip(row_ids, pd.util.hash_pandas_object(df[INDEX_COLUMNS], index=False).tolist()))
+            old = self._hashes or {}
+            # ✅ TYLKO DODANE / ZMIENIONE / USUNIĘTE WIERSZE - bez przebudowy całego indeksu
+            changed = {row_id for row_id, value in hashes.items() if old.get(row_id) != value}
+            for row_id in [row_id for row_id in old if row_id not in hashes]:
+                self._remove(row_id)
+            if changed:
+                bulk = len(changed) > INDEX_BULK_ROWS
+                mask = np.fromiter((row_id in changed for row_id in row_ids), dtype=bool, count=len(row_ids))
+                self._reindex(df.loc[mask, "id"].tolist(), index_texts(df[mask]), bulk=bulk)
+                if bulk:
+                    self._sorted_tokens = sorted(self._postings)
+            self._hashes = hashes
+            self._synced_df = df
+
+    def search(self, query):
+        terms = tokenize(query, query=True)
+        if not terms:
+            return None
+        with self._lock:
+            result = None
+            for term in terms:
+                # ✅ WYSZUKIWANIE PO PREFIKSIE
+                matched = set()
+                pos = bisect.bisect_left(self._sorted_tokens, term)
+                while pos < len(self._sorted_tokens) and self._sorted_tokens[pos].startswith(term):
+                    matched |= self._postings[self._sorted_tokens[pos]]
+                    pos += 1
+                result = matched if result is None else result & matched
+                if not result:
+                    break
+            return result
+
+@shared_resource
+def get_search_index():
+    return SearchIndex()
+
+@shared_resource
+def get_archive_search_index():
+    return SearchIndex()
+
+@profiled("search_sold")
+def search_sold(query):
+    df = load_data()
+    index = get_search_index()
+    index.sync(df)
+    row_ids = index.search(query)
+    if row_ids is None:
+        return df
+    found = df[df["id"].isin(row_ids)]
+    archive = load_archive() if list_partitions() else None
+    if archive is None:
+        return found
+    # ✅ ARCHIWUM MA WŁASNY INDEKS - budowany raz, pliki archiwum się nie zmieniają
+    archive_index = get_archive_search_index()
+    archive_index.sync(archive)
+    archive_ids = archive_index.search(query)
+    return with_archive([found], archive[archive["id"].isin(archive_ids)])
+
+# 👯 INDEKS DUPLIKATÓW - numer części / link oferty -> ostatnia sprzedaż, sprawdzenie w O(1)
+# ✅ PAMIĘĆ PER TYTUŁ - ponowne wczytanie bazy nie wyciąga numerów z tych samych tytułów jeszcze raz
+@functools.lru_cache(maxsize=PART_CACHE_SIZE)
+def part_key(title):
+    # "lusterko fabia 5J0 857 507" -> "5J0857507", "1K0199262 i 5J0857507" -> "1K0199262 5J0857507"
+    keys = []
+    for run in PART_RUN_RE.findall(title.lower()):
+        pieces = PART_SEP_RE.split(run)
+        # ✅ PEŁNE NUMERY OBOK SIEBIE ZOSTAJĄ OSOBNO ("5J0857507 2012"), KAWAŁKI JEDNEGO NUMERU SKLEJONE
+        for key in [piece for piece in pieces if len(piece) >= PART_MIN_LEN] or ["".join(pieces)]:
+            key = key.upper()
+            if len(key) >= PART_MIN_LEN and key not in keys:
+                keys.append(key)
+    return " ".join(keys)
+
+def normalize_part(text):
+    # ✅ TYLKO NUMERY - "maska octavia" można sprzedać kilka razy; kilka numerów rozdzielonych spacją
+    return part_key(str(text))
+
+def canonical_url(link):
+    link = re.sub(URL_PREFIX_RE, "", str(link).lower().strip())
+    return re.sub(URL_SUFFIX_RE, "", link)
+
+DUPLICATE_REASONS = {"part_key": "numer części", "link_key": "link oferty"}
+
+def key_pairs(df, column):
+    # (klucz, id) dla każdego wiersza z kluczem; kilka numerów części w tytule daje kilka par
+    keys, ids = df[column].tolist(), df["id"].tolist()
+    if column == "part_key" and any(" " in key for key in keys):
+        pairs = [(part, row_id) for key, row_id in zip(keys, ids) for part in key.split()]
+        keys, ids = [key for key, _ in pairs], [row_id for _, row_id in pairs]
+    return keys, ids
+
+class DuplicateIndex:
+    def __init__(self):
+        # Dla part_key / link_key: klucz -> id ostatniego wiersza (późniejszy wygrywa) i liczba wierszy z kluczem
+        self._last = {column: {} for column in DUPLICATE_REASONS}
+        self._counts = {column: Counter() for column in DUPLICATE_REASONS}
+        self._synced_df = None
+        self._lock = threading.Lock()
+
+    def _rebuild(self, df):
+        for column in DUPLICATE_REASONS:
+            keys, ids = key_pairs(df, column)
+            self._last[column] = dict(zip(keys, ids))
+            self._counts[column] = Counter(keys)
+            self._last[column].pop("", None)
+            self._counts[column].pop("", None)
+
+    def _apply(self, old_rows, new_rows, df):
+        for column in DUPLICATE_REASONS:
+            last, counts, stale = self._last[column], self._counts[column], set()
+            for key, row_id in zip(*key_pairs(old_rows, column)):
+                if not key:
+                    continue
+                counts[key] -= 1
+                if not counts[key]:
+                    del counts[key], last[key]
+                elif last[key] == row_id:
+                    stale.add(key)
+            for key, row_id in zip(*key_pairs(new_rows, column)):
+                if key:
+                    counts[key] += 1
+                    last[key] = row_id
+                    stale.discard(key)
+            # ✅ USUNIĘTY / ZMIENIONY OSTATNI WIERSZ KLUCZA - szukamy poprzedniego (rzadkie, tylko te klucze)
+            for key in stale:
+                values = df[column]
+                has_key = values == key if column == "link_key" else values.str.contains(rf"(?:^| ){re.escape(key)}(?: |$)", regex=True)
+                last[key] = df.loc[has_key, "id"].iloc[-1]
+
+    def sync(self, df):
+        if df is self._synced_df:
+            return
+        with self._lock:
+            if df is self._synced_df:
+                return
+            old = self._synced_df
+            changed = data_changes(old, df) if old is not None else None
+            if changed is None:
+                # ✅ PEŁNE WCZYTANIE - słowniki od nowa; klucze liczone razem z kolumnami pochodnymi
+                self._rebuild(df)
+            else:
+                # ✅ ZMIANY ZNANE Z WPISÓW - odejmujemy klucze starych wierszy zmienionych id, dodajemy nowe
+                self._apply(old.loc[old["id"].isin(changed)], df.loc[df["id"].isin(changed)], df)
+            self._synced_df = df
+
+    def check(self, rows):
+        # Dla każdego wiersza None albo {"reason", "match"} - wcześniejsza sprzedaż z bazy lub z tej samej listy
+        with self._lock:
+            df = self._synced_df
+            seen, found = {}, []
+            for row in rows:
+                link = canonical_url(row.get("link", ""))
+                keys = [("part_key", part) for part in normalize_part(row.get("tytul", "")).split()]
+                keys += [("link_key", link)] if link else []
+                duplicate = None
+                for key in keys:
+                    column, value = key
+                    if key in seen:
+                        duplicate = {"reason": DUPLICATE_REASONS[column], "match": seen[key]}
+                    elif value in self._last[column]:
+                        row_id = self._last[column][value]
+                        match = df.loc[df["id"] == row_id, COLUMNS].iloc[-1].to_dict()
+                        duplicate = {"reason": DUPLICATE_REASONS[column], "match": match}
+                    if duplicate:
+                        break
+                for key in keys:
+                    seen.setdefault(key, row)
+                found.append(duplicate)
+            return found
+
+@shared_resource
+def get_duplicate_index():
+    return DuplicateIndex()
+
+@shared_resource
+def get_archive_duplicate_index():
+    return DuplicateIndex()
+
+@profiled("find_duplicates")
+def find_duplicates(rows):
+    index = get_duplicate_index()
+    index.sync(load_data())
+    found = index.check(rows)
+    archive = load_archive() if list_partitions() else None
+    if archive is None:
+        return found
+    # ✅ SPRZEDAŻ Z ARCHIWUM TEŻ JEST DUPLIKATEM - baza ma pierwszeństwo (nowsza)
+    archive_index = get_archive_duplicate_index()
+    archive_index.sync(archive)
+    return [duplicate or archived for duplicate, archived in zip(found, archive_index.check(rows))]
+
+# 📈 STATYSTYKI - sumy per (okres, platforma) i liczniki numerów części, poprawiane tylko o zmienione wiersze
+class SalesStats:
+    def __init__(self):
+        self._totals = {}
+        self._parts = {}
+        self._keys = None
+        self._hashes = None
+        self._part_keys = None
+        self._synced_df = None
+        self._lock = threading.Lock()
+
+    def _add_total(self, key, count, cena):
+        total = self._totals.setdefault(key, [0, 0.0])
+        total[0] += count
+        total[1] += cena
+        if not total[0]:
+            del self._totals[key]
+
+    def _add_part(self, part, count):
+        count = self._parts.get(part, 0) + count
+        if count:
+            self._parts[part] = count
+        else:
+            del self._parts[part]
+
+    def _add(self, df, sign):
+        if df.empty:
+            return
+        # ✅ KLUCZE OKRESÓW JAKO LICZBY: dzień / poniedziałek tygodnia / miesiąc od 1970 (1970-01-01 to czwartek)
+        dates = df["dodano_dt"].to_numpy()
+        valid = ~np.isnat(dates)
+        days = dates.astype("datetime64[D]").astype("int64")
+        periods = (days, days - (days + 3) % 7, dates.astype("datetime64[M]").astype("int64"))
+        platforms = df["platform"].astype(str).to_numpy()
+        prices = df["cena_num"].fillna(0.0).to_numpy()
+        parts = df["part_key"].to_numpy(dtype=object)
+        if len(df) <= INDEX_BULK_ROWS:
+            # ✅ KILKA ZMIENIONYCH WIERSZY - pętla tańsza niż grupowanie
+            for i in np.flatnonzero(valid).tolist():
+                for period, keys in zip(STATS_PERIODS, periods):
+                    self._add_total((period, int(keys[i]), platforms[i]), sign, sign * float(prices[i]))
+            for part in parts[parts != ""].tolist():
+                # ✅ KILKA NUMERÓW W TYTULE - każdy liczony osobno
+                for key in part.split():
+                    self._add_part(key, sign)
+            return
+        # ✅ CAŁA BAZA - grupowanie wektorowe
+        frame = pd.DataFrame({"platform": platforms, "cena": prices})[valid]
+        for period, keys in zip(STATS_PERIODS, periods):
+            grouped = frame.assign(key=keys[valid]).groupby(["key", "platform"])["cena"].agg(["count", "sum"])
+            for (key, platform), count, cena in zip(grouped.index, grouped["count"].tolist(), grouped["sum"].tolist()):
+                self._add_total((period, key, platform), sign * count, sign * cena)
+        for part, count in pd.Series(parts[parts != ""]).str.split().explode().value_counts().items():
+            self._add_part(part, sign * count)
+
+    def _row_keys(self, df):
+        keys = pd.Index(df["id"])
+        if not keys.is_unique:
+            # ✅ POWTÓRZONE id (stare wpisy) - każde wystąpienie liczone osobno
+            keys = pd.Index(df["id"].astype(str) + "#" + df.groupby("id", sort=False).cumcount().astype(str))
+        hashes = pd.util.hash_pandas_object(df[["platform", "dodano_dt", "cena_num"]], index=False).to_numpy()
+        return keys, hashes, df["part_key"].to_numpy(dtype=object)
+
+    def sync(self, df):
+        if df is self._synced_df:
+            return
+        with self._lock:
+            if df is self._synced_df:
+                return
+            old = self._synced_df
+            changed = data_changes(old, df) if old is not None else None
+            if old is None:
+                self._add(df, 1)
+            elif changed is not None:
+                # ✅ ZMIANY ZNANE Z WPISÓW (dziennik / własny zapis Arrow) - wkład tylko tych id, bez haszowania bazy
+                self._add(old.loc[old["id"].isin(changed), STATS_COLUMNS], -1)
+                self._add(df.loc[df["id"].isin(changed), STATS_COLUMNS], 1)
+            else:
+                # ✅ PEŁNE WCZYTANIE (zmiana spoza procesu) - wiersze bez zmian zostają,
+                # stary wkład zmienionych / usuniętych odejmujemy, nowy dodajemy
+                if self._keys is None:
+                    self._keys, self._hashes, self._part_keys = self._row_keys(old)
+                keys, hashes, part_keys = self._row_keys(df)
+                pos = self._keys.get_indexer(keys)
+                found = np.flatnonzero(pos >= 0)
+                same = np.zeros(len(df), dtype=bool)
+                same[found] = (self._hashes[pos[found]] == hashes[found]) & (self._part_keys[pos[found]] == part_keys[found])
+                kept = np.zeros(len(old), dtype=bool)
+                kept[pos[same]] = True
+                self._add(old.loc[~kept, STATS_COLUMNS], -1)
+                self._add(df.loc[~same, STATS_COLUMNS], 1)
+                self._keys, self._hashes, self._part_keys = keys, hashes, part_keys
+                self._synced_df = df
+                return
+            # ✅ KLUCZE WIERSZY LICZONE DOPIERO PRZY PEŁNYM PORÓWNANIU
+            self._keys = self._hashes = self._part_keys = None
+            self._synced_df = df
+
+    def period_totals(self, period):
+        with self._lock:
+            return {(key, platform): list(total) for (p, key, platform), total in self._totals.items() if p == period}
+
+    def part_counts(self):
+        with self._lock:
+            return dict(self._parts)
+
+    def rollup(self, period, limit=STATS_ROWS, archive=None):
+        # Ramka: ostatnie okresy (najnowsze na górze), sztuki i suma cen dla każdej platformy i razem
+        # archive: SalesStats zarchiwizowanych miesięcy, dodawane do sum bazy
+        totals = self.period_totals(period)
+        if archive is not None:
+            for key, (count, cena) in archive.period_totals(period).items():
+                total = totals.setdefault(key, [0, 0.0])
+                total[0] += count
+                total[1] += cena
+        keys = heapq.nlargest(limit, {key for key, _ in totals})
+        columns = [f"{name} {unit}" for name in PLATFORMS + ["Razem"] for unit in ("szt.", "zł")]
+        rows = []
+        for key in keys:
+            row = dict.fromkeys(columns, 0)
+            for platform in PLATFORMS:
+                count, cena = totals.get((key, platform), (0, 0.0))
+                row[f"{platform} szt."], row[f"{platform} zł"] = count, round(cena, 2)
+                row["Razem szt."] += count
+                row["Razem zł"] = round(row["Razem zł"] + cena, 2)
+            rows.append(row)
+        return pd.DataFrame(rows, index=pd.Index([period_label(period, key) for key in keys], name=period), columns=columns)
+
+    def top_parts(self, limit=STATS_TOP_PARTS, archive=None):
+        # [(numer części, ile razy sprzedany)] - tylko numery sprzedane więcej niż raz
+        parts = self.part_counts()
+        if archive is not None:
+            for part, count in archive.part_counts().items():
+                parts[part] = parts.get(part, 0) + count
+        # ✅ PRZY REMISIE KOLEJNOŚĆ ALFABETYCZNA - ten sam wynik niezależnie od historii zmian
+        top = heapq.nsmallest(limit, parts.items(), key=lambda item: (-item[1], item[0]))
+        return [(part, count) for part, count in top if count > 1]
+
+def period_label(period, key):
+    if period == "Miesiąc":
+        return str(np.datetime64(key, "M"))
+    day = pd.Timestamp(np.datetime64(key, "D"))
+    if period == "Tydzień":
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    return day.strftime("%Y-%m-%d")
+
+@shared_resource
+def get_sales_stats():
+    return SalesStats()
+
+@shared_resource
+def get_archive_stats():
+    return SalesStats()
+
+@profiled("sales_stats")
+def sales_stats(period, limit=STATS_ROWS, archive=False):
+    # archive=True - razem z zarchiwizowanymi miesiącami (wczytanie archiwum przy pierwszym użyciu)
+    stats = get_sales_stats()
+    stats.sync(load_data())
+    archive_stats = None
+    if archive and list_partitions():
+        archive_stats = get_archive_stats()
+        archive_stats.sync(load_archive())
+    return stats.rollup(period, limit, archive_stats), stats.top_parts(STATS_TOP_PARTS, archive_stats)
+
+# 🔒 BLOKADA ZAPISU - jeden zapis naraz, także między procesami (plik baza.lock)
+_write_lock = threading.RLock()
+_write_lock_depth = 0
+
+def _lock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue
+
+def _unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def storage_lock():
+    global _write_lock_depth
+    with _write_lock:
+        # ✅ ZAGNIEŻDŻONE WYWOŁANIA (np. insert_rows -> save_data) NIE BLOKUJĄ SAMYCH SIEBIE
+        if _write_lock_depth:
+            _write_lock_depth += 1
+            try:
+                yield
+            finally:
+                _write_lock_depth -= 1
+            return
+        with open(LOCK_PATH, "a+") as f:
+            _lock_file(f)
+            _write_lock_depth = 1
+            try:
+                yield
+            finally:
+                _write_lock_depth = 0
+                _unlock_file(f)
+
+def make_row_id(prefix, name):
+    # ✅ SUFIKS LOSOWY - dwa zapisy w tej samej sekundzie nie dostaną tego samego id
+    return f"{prefix}-{name}-{int(time.time())}-{uuid.uuid4().hex[:6]}"
+
+def lookup_values(df, keys):
+    values = {}
+    for row_id, column in keys:
+        match = df.loc[df["id"] == row_id, column]
+        values[(row_id, column)] = match.iloc[-1] if len(match) else None
+    return values
+
+# ⚡ OPTYMALIZACJA - szybszy zapis
+@profiled("save_data")
+def save_data(df):
+    with storage_lock():
+        if STORAGE_MODE == "sqlite":
+            df = df.replace('nan', '').fillna('')
+            with db_transaction() as conn:
+                conn.execute("DELETE FROM baza")
+                db_insert_rows(conn, df.to_dict("records"))
+        elif STORAGE_MODE == "arrow":
+            df = df.reindex(columns=COLUMNS).astype(str).replace('nan', '').fillna('')
+            write_arrow(frame_to_arrow(add_derived_columns(df)))
+        else:
+            write_snapshot(df)
+        if STORAGE_MODE == "journal" and os.path.exists(JOURNAL_PATH):
+            os.remove(JOURNAL_PATH)
+    # ✅ BACKUP PO KAŻDYM ZAPISIE - w tle, bez blokowania interfejsu
+    request_backup()
+    invalidate_data()
+
+# ✏️ POJEDYNCZE ZMIANY - w trybie "journal" koszt nie rośnie z rozmiarem bazy
+def insert_rows(rows):
+    with storage_lock():
+        if STORAGE_MODE == "sqlite":
+            with db_transaction() as conn:
+                db_insert_rows(conn, rows)
+        elif STORAGE_MODE == "journal":
+            for row in rows:
+                append_journal({"op": "insert", "row": row})
+            maybe_compact_journal()
+        elif STORAGE_MODE == "arrow":
+            write_arrow_records(read_arrow_frame(categorical=False), [{"op": "insert", "row": row} for row in rows])
+        else:
+            # ✅ ŚWIEŻY ODCZYT POD BLOKADĄ - nie nadpisujemy zmian innych sesji
+            current_df = read_all()
+            save_data(pd.concat([current_df, pd.DataFrame(rows)], ignore_index=True))
+            return
+    request_backup()
+    invalidate_data()
+
+def update_fields(changes, expected=None):
+    # changes: {(row_id, kolumna): wartość} - zapisywane jednym zapisem
+    # expected: {(row_id, kolumna): wartość widziana przez użytkownika} - kontrola konfliktów
+    for _, column in changes:
+        if column not in COLUMNS:
+            raise ValueError(f"Nieznana kolumna: {column}")
+    if not changes:
+        return []
+    expected = expected or {}
+    with storage_lock():
+        if STORAGE_MODE == "sqlite":
+            conn = get_db()
+            with DB_LOCK:
+                current = {}
+                for row_id, column in changes:
+                    found = conn.execute(f"SELECT {column} FROM baza WHERE id = ? ORDER BY rowid DESC LIMIT 1", (row_id,)).fetchone()
+                    current[(row_id, column)] = found[0] if found else None
+        elif STORAGE_MODE == "journal":
+            current = lookup_values(load_data(), changes)
+        elif STORAGE_MODE == "arrow":
+            current_df = read_arrow_frame(categorical=False)
+            current = lookup_values(current_df, changes)
+        else:
+            current_df = read_all()
+            current = lookup_values(current_df, changes)
+        
+        accepted, conflicts = {}, []
+        for key, value in changes.items():
+            now_value = current[key]
+            # ✅ WIERSZ USUNIĘTY LUB POLE ZMIENIONE PRZEZ KOGOŚ INNEGO - zmiana odrzucona
+            if now_value is None or (key in expected and now_value != expected[key] and now_value != value):
+                conflicts.append({"id": key[0], "column": key[1], "value": value, "current": now_value})
+            else:
+                accepted[key] = value
+        if not accepted:
+            return conflicts
+        
+        if STORAGE_MODE == "sqlite":
+            with db_transaction() as conn:
+                for (row_id, column), value in accepted.items():
+                    conn.execute(f"UPDATE baza SET {column} = ? WHERE id = ?", (value, row_id))
+        elif STORAGE_MODE == "journal":
+            for (row_id, column), value in accepted.items():
+                append_journal({"op": "update", "id": row_id, "column": column, "value": value})
+            maybe_compact_journal()
+        elif STORAGE_MODE == "arrow":
+            write_arrow_records(current_df, [
+                {"op": "update", "id": row_id, "column": column, "value": value}
+                for (row_id, column), value in accepted.items()
+            ])
+        else:
+            for (row_id, column), value in accepted.items():
+                current_df.loc[current_df["id"] == row_id, column] = value
+            save_data(current_df)
+            return conflicts
+    request_backup()
+    invalidate_data()
+    return conflicts
+
+def update_field(row_id, column, value, expected=None):
+    expected = {} if expected is None else {(row_id, column): expected}
+    return update_fields({(row_id, column): value}, expected)
+
+def delete_row(row_id):
+    with storage_lock():
+        if STORAGE_MODE == "sqlite":
+            with db_transaction() as conn:
+                conn.execute("DELETE FROM baza WHERE id = ?", (row_id,))
+        elif STORAGE_MODE == "journal":
+            append_journal({"op": "delete", "id": row_id})
+            maybe_compact_journal()
+        elif STORAGE_MODE == "arrow":
+            write_arrow_records(read_arrow_frame(categorical=False), [{"op": "delete", "id": row_id}])
+        else:
+            current_df = read_all()
+            save_data(current_df[current_df["id"] != row_id].reset_index(drop=True))
+            return
+    request_backup()
+    invalidate_data()
+
+# ✏️ BUFOR ZAPISU - edycje pól łączone per (id, kolumna) i zapisywane po WRITE_BEHIND_DELAY
+# Bufor jest wspólny dla procesu, ale każda edycja należy do sesji (session) - licznik, zapis na żądanie
+# i konflikty dotyczą tylko jej edycji; session=None to edycje bez sesji (CLI, API) albo wszystkie przy flush
+class WriteBehindBuffer:
+    def __init__(self, delay):
+        self.delay = delay
+        self._pending = {}
+        self._owners = {}
+        self._expected = {}
+        self._conflicts = {}
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def add(self, row_id, column, value, expected=None, session=None):
+        key = (row_id, column)
+        with self._lock:
+            pending = self._pending.get(key)
+            # ✅ DWIE SESJE EDYTUJĄ TO SAMO POLE - późniejsza widziała nieaktualną wartość
+            if key in self._pending and expected is not None and expected != pending and value != pending:
+                self._conflicts.setdefault(session, []).append({"id": row_id, "column": column, "value": value, "current": pending})
+                return
+            if key not in self._pending and expected is not None:
+                self._expected[key] = expected
+            # ✅ OSTATNIA EDYCJA POLA - zapis (i ewentualny konflikt) należy do sesji, która ją zrobiła
+            self._pending[key] = value
+            self._owners[key] = session
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def get(self, row_id, column, default):
+        with self._lock:
+            return self._pending.get((row_id, column), default)
+
+    def pending_count(self, session=None):
+        with self._lock:
+            return sum(owner == session for owner in self._owners.values())
+
+    def pop_conflicts(self, session=None):
+        with self._lock:
+            return self._conflicts.pop(session, [])
+
+    def flush(self, session=None):
+        # session=None zapisuje edycje wszystkich sesji (timer, zamknięcie, archiwizacja)
+        with self._lock:
+            keys = [key for key, owner in self._owners.items() if session is None or owner == session]
+            changes = {key: self._pending.pop(key) for key in keys}
+            owners = {key: self._owners.pop(key) for key in keys}
+            expected = {key: self._expected.pop(key) for key in keys if key in self._expected}
+            if self._timer is not None and not self._pending:
+                self._timer.cancel()
+                self._timer = None
+        if changes:
+            conflicts = update_fields(changes, expected)
+            if conflicts:
+                with self._lock:
+                    for conflict in conflicts:
+                        owner = owners[(conflict["id"], conflict["column"])]
+                        self._conflicts.setdefault(owner, []).append(conflict)
+        return len(changes)
+
+@shared_resource
+def get_write_buffer():
+    return WriteBehindBuffer(WRITE_BEHIND_DELAY)
+
+# 🚪 ZAMKNIĘCIE PROCESU - jeden hak: najpierw bufor zapisu, potem kopia razem z jego zmianami
+# (osobne haki atexit wykonywały się od końca, więc kopia powstawała przed ostatnim zapisem bufora)
+def shutdown():
+    _shutting_down.set()
+    get_write_buffer().flush()
+    if _backup_requested.is_set():
+        backup_data()
+
+atexit.register(shutdown)
+
+def offer_from_href(href):
+    offer_id = href.split("-")[-1].replace("nr", "")
+    clean = href.replace("httpshttps", "https").replace("https//", "https://").replace("https://sprzedajemy.plhttps://", "https://sprzedajemy.pl/")
+    full_url = "https://sprzedajemy.pl" + href if not href.startswith("https") else clean
+    return offer_id, full_url
+
+# ⚡ SZYBKI PARSER - tylko znaczniki <a>, bez budowania drzewa dokumentu
+class OfferLinkParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.hrefs = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag != "a":
+            return
+        href = dict(attrs).get("href")
+        if href and "sprzedajemy.pl/" in href and "nr" in href:
+            self.hrefs.append(href)
+
+@profiled("parse")
+def extract_ids_and_links(html):
+    parser = OfferLinkParser()
+    parser.feed(html)
+    parser.close()
+    ids, urls = [], []
+    for href in parser.hrefs:
+        offer_id, full_url = offer_from_href(href)
+        ids.append(offer_id)
+        urls.append(full_url)
+    return ids, urls
+
+# 🐢 WERSJA REFERENCYJNA (BeautifulSoup) - do porównań wyników szybkiego parsera
+def extract_ids_and_links_bs4(html):
+    # ✅ bs4 TYLKO DLA PORÓWNANIA W BENCHMARKACH - nie spowalnia startu
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    links = soup.select("a[href*='sprzedajemy.pl/'][href*='nr']")
+    ids, urls = [], []
+    for link in links:
+        href = link.get("href", "")
+        if "nr" in href:
+            offer_id, full_url = offer_from_href(href)
+            ids.append(offer_id)
+            urls.append(full_url)
+    return ids, urls
+
+# ⚡ WSPÓLNA SESJA HTTP - keep-alive i pula połączeń (bez nowego TLS przy każdym zapytaniu)
+@shared_resource
+def get_http_session():
+    session = requests.Session()
+    session.headers.update(HTTP_HEADERS)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+# ⚡ PULA WĄTKÓW - oba zapytania do sprzedajemy.pl lecą równolegle
+@shared_resource
+def get_fetch_pool():
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="oscar-fetch")
+
+# 🛡️ BEZPIECZNIK - po serii błędów host odrzucany od razu, po BREAKER_COOLDOWN s kolejna próba
+class SiteUnavailable(requests.exceptions.RequestException):
+    pass
+
+class CircuitBreaker:
+    def __init__(self, failures, cooldown):
+        self.failures = failures
+        self.cooldown = cooldown
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def allow(self, host):
+        with self._lock:
+            failures, opened_at = self._hosts.get(host, (0, None))
+            if opened_at is None:
+                return True
+            if time.monotonic() - opened_at < self.cooldown:
+                return False
+            # ✅ PÓŁOTWARTY - zapytania przechodzą, ale pierwszy błąd znów otwiera bezpiecznik
+            self._hosts[host] = (self.failures - 1, None)
+            return True
+
+    def success(self, host):
+        with self._lock:
+            self._hosts.pop(host, None)
+
+    def failure(self, host):
+        with self._lock:
+            failures, opened_at = self._hosts.get(host, (0, None))
+            failures += 1
+            if failures >= self.failures:
+                opened_at = time.monotonic()
+            self._hosts[host] = (failures, opened_at)
+
+    def is_open(self, host):
+        with self._lock:
+            opened_at = self._hosts.get(host, (0, None))[1]
+            return opened_at is not None and time.monotonic() - opened_at < self.cooldown
+
+@shared_resource
+def get_circuit_breaker():
+    return CircuitBreaker(BREAKER_FAILURES, BREAKER_COOLDOWN)
+
+def http_get(url, headers=None):
+    host = urlsplit(url).netloc
+    breaker = get_circuit_breaker()
+    if not breaker.allow(host):
+        raise SiteUnavailable(f"{host} niedostępny - bezpiecznik otwarty")
+    for attempt in range(HTTP_RETRIES + 1):
+        if attempt:
+            # ✅ LOSOWY ODSTĘP (full jitter) - sesje nie ponawiają w tym samym momencie
+            time.sleep(random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2 ** attempt)))
+        try:
+            response = get_http_session().get(url, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_TIMEOUT), headers=headers)
+        except requests.exceptions.ReadTimeout:
+            # ✅ PO PEŁNYM TIMEOUCIE BEZ PONOWIENIA - to już HTTP_TIMEOUT s czekania
+            breaker.failure(host)
+            raise
+        except (requests.exceptions.ConnectionError, requests.exceptions.ConnectTimeout):
+            breaker.failure(host)
+            if breaker.is_open(host):
+                break
+            continue
+        if response.status_code in HTTP_RETRY_STATUSES:
+            breaker.failure(host)
+            if breaker.is_open(host):
+                break
+            continue
+        breaker.success(host)
+        return response
+    raise SiteUnavailable(f"{host} niedostępny po {attempt + 1} próbach")
+
+# 💽 CACHE HTTP NA DYSKU - SQLite, treść skompresowana, usuwanie najdawniej używanych (LRU)
+class HttpCache:
+    def __init__(self, path, max_bytes):
+        self.max_bytes = max_bytes
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (url TEXT PRIMARY KEY, body BLOB NOT NULL, etag TEXT, "
+                "last_modified TEXT, fetched_at REAL NOT NULL, accessed_at REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+
+    def get(self, url):
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT body, etag, last_modified, fetched_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (time.time(), url))
+        body, etag, last_modified, fetched_at = row
+        return {"text": gzip.decompress(body).decode("utf-8"), "etag": etag,
+                "last_modified": last_modified, "fetched_at": fetched_at}
+
+    def put(self, url, text, etag=None, last_modified=None):
+        body = gzip.compress(text.encode("utf-8"))
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               (url, body, etag, last_modified, now, now, len(body)))
+            self._evict()
+
+    def touch(self, url):
+        # ✅ 304 NOT MODIFIED - treść bez zmian, tylko nowy czas pobrania
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, url))
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # ✅ ZAPAS 10% - usuwanie nie powtarza się przy każdym kolejnym zapisie
+        evicted = []
+        for url, size in self._conn.execute("SELECT url, size FROM responses ORDER BY accessed_at"):
+            if total <= self.max_bytes * 0.9:
+                break
+            evicted.append((url,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE url = ?", evicted)
+
+    def stats(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+
+@shared_resource
+def get_http_cache():
+    return HttpCache(HTTP_CACHE_PATH, HTTP_CACHE_MAX_BYTES)
+
+_revalidating = set()
+_revalidating_lock = threading.Lock()
+
+def revalidate(url, entry=None):
+    headers = {}
+    if entry is not None:
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+    response = http_get(url, headers)
+    cache = get_http_cache()
+    if response.status_code == 304 and entry is not None:
+        cache.touch(url)
+        return entry["text"]
+    if response.status_code == 200 and "no-store" not in response.headers.get("Cache-Control", ""):
+        cache.put(url, response.text, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    return response.text
+
+def revalidate_in_background(url, entry):
+    with _revalidating_lock:
+        if url in _revalidating:
+            return
+        _revalidating.add(url)
+
+    def run():
+        try:
+            revalidate(url, entry)
+        except requests.exceptions.RequestException:
+            pass
+        finally:
+            with _revalidating_lock:
+                _revalidating.discard(url)
+
+    get_fetch_pool().submit(run)
+
+@profiled("http_fetch")
+def fetch_html(url):
+    if not HTTP_CACHE_ENABLED:
+        return http_get(url).text
+    entry = get_http_cache().get(url)
+    if entry is not None:
+        age = time.time() - entry["fetched_at"]
+        if age < HTTP_CACHE_TTL:
+            return entry["text"]
+        if HTTP_CACHE_SWR and age < HTTP_CACHE_STALE_MAX:
+            # ✅ STARA WERSJA OD RAZU, ŚWIEŻA POBIERANA W TLE NA KOLEJNE WYSZUKIWANIE
+            revalidate_in_background(url, entry)
+            return entry["text"]
+    return revalidate(url, entry)
+
+def build_search_urls(base):
+    url_title = f"{SPRZEDAJEMY_URL}/szukaj?schm2=ls&catCode=6bea9f&inp_text%5Bv%5D={base}&inp_category_id=2&inp_location_id=1"
+    url_id = f"{url_title}&inp_text%5Bn%5D=1"
+    return url_title, url_id
+
+def empty_sprzedajemy_result(base, error=None):
+    url_title, url_id = build_search_urls(base)
+    return {"ids_title": [], "urls_title": [], "ids_id": [], "urls_id": [], "url_title": url_title, "url_id": url_id, "error": error}
+
+def analyze_search(base):
+    url_title, url_id = build_search_urls(base)
+
+    # ⚡ DODAJ TIMEOUT - szybsze błędy
+    try:
+        pool = get_fetch_pool()
+        fetch = get_profiler().bind(fetch_html) if PROFILE_ENABLED else fetch_html
+        future_title = pool.submit(fetch, url_title)
+        future_id = pool.submit(fetch, url_id)
+        html_title = future_title.result()
+        html_id = future_id.result()
+    except requests.exceptions.Timeout:
+        return empty_sprzedajemy_result(base, "timeout")
+    except SiteUnavailable:
+        return empty_sprzedajemy_result(base, "unavailable")
+    except Exception as e:
+        return empty_sprzedajemy_result(base, str(e))
+    
+    ids_title, urls_title = extract_ids_and_links(html_title)
+    ids_id, urls_id = extract_ids_and_links(html_id)
+
+    return {
+        "ids_title": ids_title,
+        "urls_title": urls_title,
+        "ids_id": ids_id,
+        "urls_id": urls_id,
+        "url_title": url_title,
+        "url_id": url_id,
+        "error": None
+    }
+
+# 🧩 REJESTR DOSTAWCÓW - każdy z własnym limitem czasu i liczbą równoczesnych zapytań
+class Provider:
+    def __init__(self, name, label, search, timeout, max_concurrency, fallback=None, icon="🔗", description=""):
+        self.name = name
+        self.label = label
+        self.icon = icon
+        self.description = description
+        self.search = search
+        self.timeout = timeout
+        self.fallback = fallback
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def run(self, query):
+        with self._slots:
+            try:
+                return self.search(query)
+            except Exception as e:
+                return self.failed(query, str(e))
+
+    def failed(self, query, error):
+        return self.fallback(query, error) if self.fallback else {"error": error}
+
+PROVIDERS = {}
+
+def register_provider(name, label, timeout=HTTP_TIMEOUT, max_concurrency=4, fallback=None, icon="🔗", description=""):
+    def decorator(fn):
+        PROVIDERS[name] = Provider(name, label, fn, timeout, max_concurrency, fallback, icon, description)
+        return fn
+    return decorator
+
+def enabled_providers():
+    return [p for name, p in PROVIDERS.items() if not ENABLED_PROVIDERS or name in ENABLED_PROVIDERS]
+
+@shared_resource
+def get_provider_pool():
+    return ThreadPoolExecutor(max_workers=PROVIDER_WORKERS, thread_name_prefix="oscar-provider")
+
+def search_base(query):
+    return query.strip().replace(" ", "+")
+
+# ✅ DWA RÓWNOLEGŁE ZAPYTANIA PO HTTP_TIMEOUT + zapas na parsowanie
+@register_provider("sprzedajemy", "Sprzedajemy.pl", timeout=HTTP_TIMEOUT + 2, icon="📋",
+                   fallback=lambda query, error: empty_sprzedajemy_result(search_base(query), error))
+def search_sprzedajemy(query):
+    return analyze_search(search_base(query))
+
+@register_provider("allegro", "allegro.pl", timeout=1, icon="🛒", description="Twoje oferty z filtrem")
+def szukaj_allegro_parts_skoda(fraza):
+    try:
+        encoded_fraza = quote_plus(fraza)
+        allegro_url = f"https://allegro.pl/uzytkownik/PARTS_SKODA?string={encoded_fraza}"
+        
+        return {
+            "link": allegro_url,
+            "fraza": fraza,
+            "platforma": "Allegro",
+            "seller": "CZĘŚCI_SKODA"
+        }
+        
+    except Exception:
+        return None
+
+# 🔗 DOSTAWCY BEZ PARSOWANIA - gotowy link do wyszukiwarki w serwisie
+def link_result(label, url, query):
+    return {"link": url.format(query=quote_plus(query)), "fraza": query, "platforma": label}
+
+@register_provider("ovoko", "Ovoko", timeout=1, icon="📊", description="wyszukiwarka części Ovoko")
+def search_ovoko(query):
+    return link_result("Ovoko", OVOKO_SEARCH_URL, query)
+
+@register_provider("polcar", "Polcar", timeout=1, icon="🔧", description="katalog Polcar")
+def search_polcar(query):
+    return link_result("Polcar", POLCAR_SEARCH_URL, query)
+
+def search_multiple_platforms(query, on_result=None):
+    # ✅ WSZYSCY DOSTAWCY RÓWNOLEGLE - on_result(nazwa, wynik) od razu po odpowiedzi każdego z nich
+    providers = enabled_providers()
+    pool = get_provider_pool()
+    started = time.monotonic()
+    futures = {pool.submit(provider.run, query): provider for provider in providers}
+    results = {}
+    while futures:
+        deadline = min(started + provider.timeout for provider in futures.values())
+        done, _ = wait(futures, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        if not done:
+            # ✅ PRZEKROCZONY LIMIT - wynik zastępczy, wątek dostawcy kończy się w tle
+            done = [f for f, provider in futures.items() if started + provider.timeout <= time.monotonic()]
+        for future in done:
+            provider = futures.pop(future)
+            result = future.result() if future.done() else provider.failed(query, "timeout")
+            results[provider.name] = result
+            if on_result:
+                on_result(provider.name, result)
+    return {provider.name: results[provider.name] for provider in providers}
+
+# ⚡ CACHE WYNIKÓW WYSZUKIWANIA - wspólny dla wszystkich sesji, TTL + LRU
+class SearchCache:
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+@shared_resource
+def get_search_cache():
+    return SearchCache(SEARCH_CACHE_TTL, SEARCH_CACHE_MAX_ENTRIES)
+
+def normalize_query(query):
+    return " ".join(query.split()).lower()
+
+@profiled("search")
+def cached_search(query, force_refresh=False, on_result=None):
+    key = normalize_query(query)
+    cache = get_search_cache()
+    if not force_refresh:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    results = search_multiple_platforms(query, on_result)
+    # ✅ BŁĘDÓW POŁĄCZENIA NIE CACHUJEMY - kolejne odświeżenie spróbuje ponownie
+    if not any(result and result.get("error") for result in results.values()):
+        cache.put(key, results)
+    return results
+
+# ⌨️ WYSZUKIWANIE W TLE - jedno na sesję; nowsze zapytanie anuluje starsze, ostatni wynik zostaje
+@shared_resource
+def get_search_pool():
+    # ✅ OSOBNA PULA - wyszukiwanie samo zleca pobrania do get_fetch_pool(), nie może jej zablokować
+    return ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="oscar-search")
+
+class BackgroundSearch:
+    def __init__(self, delay=SEARCH_DEBOUNCE):
+        self.delay = delay
+        self._generation = 0
+        self._done_generation = 0
+        self._query = None
+        self._timer = None
+        self._future = None
+        self._result = None
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def submit(self, query, force_refresh=False):
+        key = normalize_query(query)
+        with self._lock:
+            if key == self._query and not force_refresh:
+                return
+            self._generation += 1
+            self._query = key
+            # ✅ STARSZE ZAPYTANIE: timer jeszcze nie odpalił / zadanie czeka w kolejce -> nie wystartuje
+            if self._timer is not None:
+                self._timer.cancel()
+            if self._future is not None:
+                self._future.cancel()
+            self._timer = self._future = None
+            cached = None if force_refresh else get_search_cache().get(key)
+            if cached is not None:
+                self._result = (query, cached)
+                self._done_generation = self._generation
+                self.version += 1
+                return
+            self._timer = threading.Timer(self.delay, self._start, (query, self._generation, force_refresh))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _start(self, query, generation, force_refresh):
+        with self._lock:
+            if generation == self._generation:
+                self._future = get_search_pool().submit(self._run, query, generation, force_refresh)
+
+    def _run(self, query, generation, force_refresh):
+        if generation != self._generation:
+            return
+        partial = {}
+
+        def on_result(name, result):
+            # ✅ WYNIKI KAŻDEGO DOSTAWCY WIDOCZNE OD RAZU - wolny serwis nie wstrzymuje pozostałych
+            with self._lock:
+                if generation == self._generation:
+                    partial[name] = result
+                    self._result = (query, dict(partial))
+                    self.version += 1
+
+        results = cached_search(query, force_refresh=force_refresh, on_result=on_result)
+        with self._lock:
+            # ✅ WYNIK ZAPYTANIA, KTÓRE UŻYTKOWNIK JUŻ ZMIENIŁ, JEST POMIJANY
+            if generation == self._generation:
+                self._result = (query, results)
+                self._done_generation = generation
+                self.version += 1
+
+    def status(self):
+        # (zapytanie, wyniki) - ostatnie zakończone lub częściowe bieżącego - + czy wyszukiwanie trwa
+        with self._lock:
+            return self._result, self._done_generation != self._generation
+
+def get_best_offer_link(results, query):
+    sprzedajemy_result = results.get("sprzedajemy") or empty_sprzedajemy_result(search_base(query))
+    allegro_result = results.get("allegro")
+    
+    ids_title, urls_title = sprzedajemy_result["ids_title"], sprzedajemy_result["urls_title"]
+    ids_id, urls_id = sprzedajemy_result["ids_id"], sprzedajemy_result["urls_id"]
+    
+    if len(ids_title) == 1:
+        return urls_title[0], "Sprzedajemy.pl", f"Konkretna oferta: {query}"
+    elif len(ids_id) == 1:
+        return urls_id[0], "Sprzedajemy.pl", f"Konkretna oferta: {query}"
+    elif len(ids_title) > 0 or len(ids_id) > 0:
+        if len(ids_title) > len(ids_id):
+            return sprzedajemy_result["url_title"], "Sprzedajemy.pl", f"Lista ofert: {query}"
+        else:
+            return sprzedajemy_result["url_id"], "Sprzedajemy.pl", f"Lista ofert: {query}"
+    elif allegro_result and allegro_result["link"]:
+        return allegro_result["link"], "Allegro", f"Wyszukiwanie Allegro: {query}"
+    else:
+        base = query.strip().replace(" ", "+")
+        url_title, _ = build_search_urls(base)
+        return url_title, "Sprzedajemy.pl", f"Wyszukiwanie: {query}"
+
+def build_sold_row(query, offer_url, platform, opis, now):
+    return {
+        "id": make_row_id(platform.lower().replace('.', ''), query),
+        "tytul": f"{query}",
+        "cena": "",
+        "link": offer_url,
+        "opis": opis,
+        "status": f"Sprzedana ({now})",
+        "notatka": "",
+        "dodano": now
+    }
+
+def build_manual_row(name, link, note, now):
+    return {
+        "id": make_row_id("manual", name),
+        "tytul": name,
+        "cena": "",
+        "link": link,
+        "opis": f"Ręcznie dodana oferta: {name}",
+        "status": f"Sprzedana ({now})",
+        "notatka": note,
+        "dodano": now
+    }
+
+# 📋 TRYB WSADOWY
+class RateLimiter:
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+def read_batch_column(csv_file):
+    content = csv_file.read() if hasattr(csv_file, "read") else open(csv_file, "rb").read()
+    if isinstance(content, bytes):
+        content = content.decode("utf-8-sig", errors="replace")
+    lines = content.splitlines()
+    try:
+        # ✅ TYLKO TYPOWE SEPARATORY - sniffer bez listy wybiera znak ze środka numeru ("5J0853661" -> "5J0853")
+        dialect = csv.Sniffer().sniff("\n".join(lines[:20]), delimiters=",;\t")
+    except csv.Error:
+        # ✅ JEDNA KOLUMNA - każda linia to jedna pozycja
+        return lines
+    return [row[0] for row in csv.reader(lines, dialect) if row]
+
+def parse_batch_input(text="", csv_file=None):
+    items = re.split(r"[\n,;\t]+", text) if text else []
+    if csv_file is not None:
+        column = [item for item in read_batch_column(csv_file) if item.strip()]
+        if column and column[0].strip().lower() in BATCH_HEADER_NAMES:
+            column = column[1:]
+        items.extend(column)
+    queries, seen = [], set()
+    for item in items:
+        query = " ".join(str(item).split())
+        if query and normalize_query(query) not in seen:
+            seen.add(normalize_query(query))
+            queries.append(query)
+    return queries[:BATCH_MAX_ITEMS]
+
+def lookup_best_offer(query, limiter):
+    limiter.wait()
+    results = cached_search(query)
+    offer_url, platform, opis = get_best_offer_link(results, query)
+    sprzedajemy_result = results.get("sprzedajemy") or empty_sprzedajemy_result(search_base(query))
+    return {
+        "query": query,
+        "link": offer_url,
+        "platform": platform,
+        "opis": opis,
+        "oferty": len(sprzedajemy_result["ids_title"]) + len(sprzedajemy_result["ids_id"]),
+        "error": sprzedajemy_result.get("error"),
+    }
+
+def batch_lookup(queries, on_result=None):
+    limiter = RateLimiter(BATCH_RATE_PER_SEC)
+    results = {}
+    with ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="oscar-batch") as pool:
+        futures = {pool.submit(lookup_best_offer, query, limiter): query for query in queries}
+        for done, future in enumerate(as_completed(futures), start=1):
+            item = future.result()
+            results[futures[future]] = item
+            if on_result:
+                on_result(done, len(queries), item)
+    # ✅ WYNIKI W KOLEJNOŚCI Z LISTY, NIE W KOLEJNOŚCI ZAKOŃCZENIA
+    return [results[query] for query in queries]
+
+# 🏷️ STRONA OFERTY - tytuł i cena z meta (og:title, itemprop="price") albo z <h1> i elementu z klasą "price"
+class OfferPageParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.meta = {}
+        self.heading = []
+        self.price = []
+        self._capture = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        key = attrs.get("property") or attrs.get("itemprop")
+        if key and attrs.get("content") and (tag == "meta" or key == "price"):
+            # ✅ KWOTA MASZYNOWA TAKŻE Z ATRYBUTU (<span itemprop="price" content="1299.00">)
+            self.meta.setdefault(key, attrs["content"])
+        if tag != "meta" and self._capture is None:
+            if tag == "h1" and not self.heading:
+                self._capture = (tag, self.heading)
+            elif not self.price and (attrs.get("itemprop") == "price" or "price" in (attrs.get("class") or "").split()):
+                self._capture = (tag, self.price)
+
+    def handle_data(self, data):
+        if self._capture is not None:
+            self._capture[1].append(data)
+
+    def handle_endtag(self, tag):
+        if self._capture is not None and tag == self._capture[0]:
+            self._capture = None
+
+def parse_price(text):
+    # "1 299,99 zł" / "1.299,99" / "1,299.99" / "1299.99" -> "1299,99 zł", "120.00" -> "120 zł";
+    # None bez kwoty albo przy niejednoznacznym zapisie
+    match = PRICE_RE.search(text or "")
+    if not match:
+        return None
+    whole = re.sub(r"[.,\s]", "", match.group(1))
+    amount = float(f"{whole}.{match.group(3) or 0}")
+    amount = f"{amount:.2f}".replace(".", ",")
+    return f"{amount.removesuffix(',00')} zł"
+
+def extract_offer_details(html):
+    parser = OfferPageParser()
+    parser.feed(html)
+    parser.close()
+    title = " ".join("".join(parser.heading).split()) or parser.meta.get("og:title", "").strip()
+    # ✅ NAJPIERW KWOTA MASZYNOWA (product:price:amount, itemprop="price"), tekst ceny tylko awaryjnie
+    price = (parse_price(parser.meta.get("product:price:amount")) or parse_price(parser.meta.get("price"))
+             or parse_price("".join(parser.price)))
+    return title, price
+
+def is_offer_link(link):
+    return bool(OFFER_LINK_RE.match(str(link or "")))
+
+def offer_page_url(link):
+    # ✅ ADRES SERWISU Z USTAWIEŃ - OSCAR_SPRZEDAJEMY_OFFER_URL kieruje pobrania np. na lokalny serwer testowy
+    parts = urlsplit(link)
+    return SPRZEDAJEMY_OFFER_URL.rstrip("/") + parts.path + (f"?{parts.query}" if parts.query else "")
+
+# 🏷️ KOLEJKA UZUPEŁNIANIA - zadania w SQLite (przetrwają restart), ENRICH_WORKERS wątków z limitem zapytań
+class EnrichmentQueue:
+    def __init__(self, path, workers, per_second):
+        self.workers = workers
+        self.version = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._jobs = queue.Queue()
+        self._queued = set()
+        self._limiter = RateLimiter(per_second)
+        self._started = False
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, link TEXT NOT NULL, opis TEXT NOT NULL, "
+                "status TEXT NOT NULL, attempts INTEGER NOT NULL, next_at REAL NOT NULL, error TEXT, updated_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)")
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        # ✅ WĄTKI DAEMON - zamknięcie procesu nie czeka na kolejkę, przerwane zadanie zostaje "pending"
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f"oscar-enrich-{i}", daemon=True).start()
+        self.resume()
+
+    def submit(self, rows):
+        # ✅ TYLKO KONKRETNE OFERTY - lista wyników wyszukiwania nie ma jednej ceny
+        jobs = [(row["id"], row["link"], row.get("opis", "")) for row in rows if is_offer_link(row.get("link"))]
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, 'pending', 0, ?, NULL, ?)",
+                                   [(row_id, link, opis, now, now) for row_id, link, opis in jobs])
+        for row_id, _, _ in jobs:
+            self._schedule(row_id)
+        return len(jobs)
+
+    def resume(self):
+        with self._lock:
+            pending = self._conn.execute("SELECT id, next_at FROM jobs WHERE status = 'pending'").fetchall()
+        now = time.time()
+        for row_id, next_at in pending:
+            self._schedule(row_id, max(0.0, next_at - now))
+        return len(pending)
+
+    def retry_failed(self):
+        now = time.time()
+        with self._lock, self._conn:
+            retried = self._conn.execute(
+                "UPDATE jobs SET status = 'pending', attempts = 0, next_at = ?, updated_at = ? WHERE status = 'failed'", (now, now)
+            ).rowcount
+        self.resume()
+        return retried
+
+    def _schedule(self, row_id, delay=0.0):
+        with self._lock:
+            if row_id in self._queued:
+                return
+            self._queued.add(row_id)
+        if delay > 0:
+            timer = threading.Timer(delay, self._jobs.put, (row_id,))
+            timer.daemon = True
+            timer.start()
+        else:
+            self._jobs.put(row_id)
+
+    def _worker(self):
+        while True:
+            row_id = self._jobs.get()
+            retry_in = None
+            try:
+                retry_in = self._process(row_id)
+            except Exception as e:
+                self._finish(row_id, "failed", str(e))
+            with self._lock:
+                self._queued.discard(row_id)
+                self.version += 1
+            if retry_in is not None:
+                self._schedule(row_id, retry_in)
+
+    def _process(self, row_id):
+        # Zwraca za ile sekund ponowić zadanie albo None, gdy zakończone
+        with self._lock:
+            job = self._conn.execute(
+                "SELECT link, opis, attempts FROM jobs WHERE id = ? AND status = 'pending'", (row_id,)
+            ).fetchone()
+        if job is None:
+            return None
+        link, opis, attempts = job
+        self._limiter.wait()
+        try:
+            html = fetch_html(offer_page_url(link))
+        except requests.exceptions.RequestException as e:
+            attempts += 1
+            if attempts >= ENRICH_MAX_ATTEMPTS:
+                self._finish(row_id, "failed", str(e), attempts)
+                return None
+            retry_in = min(ENRICH_RETRY_MAX, ENRICH_RETRY_BASE * 2 ** (attempts - 1))
+            self._finish(row_id, "pending", str(e), attempts, time.time() + retry_in)
+            return retry_in
+        title, price = extract_offer_details(html)
+        # ✅ BEZ CENY TO NIE STRONA OFERTY (np. oferta usunięta) - tytułu też nie przepisujemy
+        if price is None:
+            self._finish(row_id, "failed", "brak ceny na stronie oferty", attempts + 1)
+            return None
+        # ✅ TYTUŁ DO OPISU - "tytul" zostaje numerem części (duplikaty, statystyki numerów)
+        changes, expected = {(row_id, "cena"): price}, {(row_id, "cena"): ""}
+        if title:
+            changes[(row_id, "opis")] = title
+            expected[(row_id, "opis")] = opis
+        # ✅ POLE ZMIENIONE W MIĘDZYCZASIE RĘCZNIE - zostaje wartość użytkownika
+        conflicts = update_fields(changes, expected)
+        skipped = ", ".join(c["column"] if c["current"] is not None else "oferta usunięta" for c in conflicts)
+        self._finish(row_id, "done", f"pominięto: {skipped}" if skipped else None, attempts + 1)
+        return None
+
+    def _finish(self, row_id, status, error=None, attempts=None, next_at=0.0):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, attempts = COALESCE(?, attempts), next_at = ?, updated_at = ? WHERE id = ?",
+                (status, error, attempts, next_at, time.time(), row_id),
+            )
+
+    def counts(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def active(self):
+        with self._lock:
+            return len(self._queued)
+
+    def wait(self, timeout=None):
+        # ✅ DLA CLI / CRONA - czeka na zadania w kolejce (także zaplanowane ponowienia) najwyżej timeout s
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.active() and (deadline is None or time.monotonic() < deadline):
+            time.sleep(0.1)
+        return not self.active()
+
+@shared_resource
+def get_enrichment_queue():
+    return EnrichmentQueue(ENRICH_DB_PATH, ENRICH_WORKERS, ENRICH_RATE_PER_SEC)
+
+def start_enrichment():
+    # ✅ ZADANIA PRZERWANE RESTARTEM WRACAJĄ DO KOLEJKI; None gdy uzupełnianie wyłączone
+    if not ENRICH_ENABLED:
+        return None
+    enrichment = get_enrichment_queue()
+    enrichment.start()
+    return enrichment
+
+def enqueue_enrichment(rows):
+    # ✅ TYLKO ZAPIS ZADANIA - kliknięcie "dodaj" nie czeka na pobranie strony oferty
+    if not ENRICH_ENABLED:
+        return 0
+    return get_enrichment_queue().submit(rows)
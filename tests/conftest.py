@@ -0,0 +1,42 @@
+# 🧪 WSPÓLNE FIXTURE - każdy test na pustej bazie w katalogu tymczasowym
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import oscar_core as core  # noqa: E402
+
+# ✅ ZASOBY PROCESU ZWIĄZANE Z PLIKAMI BAZY - czyszczone przed i po teście
+SHARED_RESOURCES = [
+    core.get_data_cache, core.get_archive_cache, core.get_search_index, core.get_archive_search_index,
+    core.get_duplicate_index, core.get_archive_duplicate_index, core.get_sales_stats, core.get_archive_stats,
+    core.get_write_buffer, core.get_db,
+]
+
+
+def clear_shared():
+    for resource in SHARED_RESOURCES:
+        resource.clear()
+
+
+@pytest.fixture
+def storage(request, tmp_path, monkeypatch):
+    # Tryb zapisu z parametryzacji (indirect=True), domyślnie csv
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(core, "STORAGE_MODE", getattr(request, "param", "csv"))
+    # ✅ BEZ KOPII W TLE - wątek kopii zapisałby je w katalogu kolejnego testu; testy wołają backup_data()
+    monkeypatch.setattr(core, "request_backup", lambda: None)
+    clear_shared()
+    yield core.STORAGE_MODE
+    core.get_write_buffer().flush()
+    clear_shared()
+
+
+def make_row(i, **fields):
+    row = {"id": f"manual-{i}", "tytul": f"5J0857507 {i}", "cena": "10", "link": "", "opis": "",
+           "status": "", "notatka": "", "dodano": "2024-05-06 10:00"}
+    row.update(fields)
+    return row
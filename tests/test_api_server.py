@@ -0,0 +1,61 @@
+# 🚪 SERWER API - odpowiada tylko na własny adres (ochrona przed DNS rebinding)
+#
+#   python -m pytest tests/test_api_server.py
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from conftest import REPO_DIR
+
+
+def request(port, method, path, host, body=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    headers = {"Host": host, "Content-Type": "application/json"}
+    conn.request(method, path, body=json.dumps(body).encode("utf-8") if body is not None else None, headers=headers)
+    response = conn.getresponse()
+    data = json.loads(response.read() or b"null")
+    conn.close()
+    return response.status, data
+
+
+@pytest.fixture
+def api_port(tmp_path):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, "oscar_cli.py"), "serve", "--port", str(port)],
+                              cwd=tmp_path, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(100):
+            try:
+                if request(port, "GET", "/health", f"127.0.0.1:{port}")[0] == 200:
+                    break
+            except OSError:
+                time.sleep(0.1)
+        yield port
+    finally:
+        server.terminate()
+        server.wait(10)
+
+
+def test_own_host_allowed(api_port):
+    assert request(api_port, "GET", "/health", f"localhost:{api_port}")[0] == 200
+    status, data = request(api_port, "POST", "/add", f"127.0.0.1:{api_port}", {"query": "5J0857507", "manual": True})
+    assert status == 200 and data["added"]
+    assert request(api_port, "GET", "/list", f"localhost:{api_port}")[1]["total"] == 1
+
+
+@pytest.mark.parametrize("host", ["zly.example:{port}", "127.0.0.1", "localhost:1", ""])
+def test_foreign_host_rejected(api_port, host):
+    host = host.format(port=api_port)
+    assert request(api_port, "GET", "/health", host)[0] == 403
+    status, data = request(api_port, "POST", "/add", host, {"query": "5J0857507", "manual": True})
+    assert status == 403
+    assert data == {"error": "Niedozwolony nagłówek Host"}
+    assert request(api_port, "GET", "/list", f"127.0.0.1:{api_port}")[1]["total"] == 0
@@ -0,0 +1,86 @@
+# 🗂️ KOPIE ZAPASOWE - kopia przy zamknięciu procesu zawiera edycje z bufora zapisu, a przywrócenie odtwarza archiwum
+#
+#   python -m pytest tests/test_backup.py
+import gzip
+import os
+import subprocess
+import sys
+import threading
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from conftest import REPO_DIR, core, make_row
+
+EDIT_AT_EXIT = """
+import sys
+sys.path.insert(0, {repo!r})
+import oscar_core as core
+core.insert_rows([{{"id": "manual-1", "tytul": "5J0857507", "cena": "10", "link": "", "opis": "",
+                    "status": "", "notatka": "", "dodano": "2024-05-06 10:00"}}])
+core.get_write_buffer().add("manual-1", "notatka", "zapis przy zamknięciu", "", session="A")
+"""
+
+
+def read_backup(name):
+    with gzip.open(os.path.join(core.BACKUP_DIR, name), "rb") as f:
+        return pd.read_csv(f, dtype=str, keep_default_na=False)
+
+
+@pytest.mark.parametrize("storage", ["journal"], indirect=True)
+def test_backup_waits_for_compaction(storage):
+    core.insert_rows([make_row(i) for i in range(3)])
+    core.update_field("manual-1", "notatka", "z dziennika")
+    done = threading.Event()
+    backup = threading.Thread(target=lambda: (core.backup_data(), done.set()))
+    # ✅ KOPIA W TRAKCIE KOMPAKTOWANIA - migawka już zapisana, dziennik jeszcze nieusunięty
+    with core.storage_lock():
+        core.write_snapshot(core.replay_journal(core.read_snapshot()))
+        backup.start()
+        assert not done.wait(0.3)
+        os.remove(core.JOURNAL_PATH)
+    backup.join(10)
+    (newest, _), *_ = core.list_backups()
+    df = read_backup(newest)
+    assert df["id"].tolist() == ["manual-0", "manual-1", "manual-2"]
+    assert df.set_index("id").loc["manual-1", "notatka"] == "z dziennika"
+
+
+@pytest.mark.parametrize("mode", ["csv", "journal", "sqlite", "arrow"])
+def test_backup_at_exit_has_buffered_edits(tmp_path, monkeypatch, mode):
+    monkeypatch.chdir(tmp_path)
+    env = dict(os.environ, OSCAR_STORAGE=mode)
+    subprocess.run([sys.executable, "-c", EDIT_AT_EXIT.format(repo=REPO_DIR)], env=env, check=True, timeout=60)
+    (newest, _), *_ = core.list_backups()
+    assert read_backup(newest).set_index("id").loc["manual-1", "notatka"] == "zapis przy zamknięciu"
+
+
+@pytest.mark.parametrize("storage", ["csv", "journal", "sqlite", "arrow"], indirect=True)
+def test_restore_brings_back_archive(storage):
+    core.insert_rows([make_row(i, dodano="2024-01-15 10:00") for i in range(2)]
+                     + [make_row(i, dodano="2024-05-06 10:00") for i in range(2, 4)])
+    assert core.archive_partitions(keep_months=3, now=datetime(2024, 6, 15)) == {"2024-01": 2}
+    backup = core.backup_data()
+    # ✅ PO KOPII: NOWA OFERTA I KOLEJNY MIESIĄC W ARCHIWUM
+    core.insert_rows([make_row(4, dodano="2024-06-01 10:00")])
+    assert core.archive_partitions(keep_months=1, now=datetime(2024, 6, 15)) == {"2024-05": 2}
+    assert core.restore_backup(backup) == 4
+    assert core.list_partitions() == ["2024-01"]
+    assert core.read_partition("2024-01")["id"].tolist() == ["manual-0", "manual-1"]
+    assert sorted(core.read_all()["id"]) == ["manual-2", "manual-3"]
+    assert core.count_rows() == 4
+
+
+@pytest.mark.parametrize("storage", ["csv"], indirect=True)
+def test_restore_old_backup_skips_archived(storage):
+    core.insert_rows([make_row(i, dodano="2024-01-15 10:00") for i in range(2)] + [make_row(2)])
+    backup = core.backup_data()
+    # ✅ KOPIA SPRZED ZMIANY FORMATU - bez kolumny "archiwum"
+    df = read_backup(backup).drop(columns="archiwum")
+    with gzip.open(os.path.join(core.BACKUP_DIR, backup), "wb") as f:
+        f.write(df.to_csv(index=False).encode("utf-8"))
+    core.archive_partitions(keep_months=3, now=datetime(2024, 6, 15))
+    assert core.restore_backup(backup) == 1
+    assert core.read_all()["id"].tolist() == ["manual-2"]
+    assert core.list_partitions() == ["2024-01"]
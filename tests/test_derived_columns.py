@@ -0,0 +1,49 @@
+# 🧮 KOLUMNY POCHODNE - cena_num według tych samych reguł co parse_price
+#
+#   python -m pytest tests/test_derived_columns.py
+import math
+
+import pandas as pd
+import pytest
+
+from conftest import core, make_row
+
+PRICES = [
+    ("1.299,00 zł", 1299.0),
+    ("1,299.00", 1299.0),
+    ("ok. 50 zł", 50.0),
+    ("1 299,99 zł", 1299.99),
+    ("120,50 zł", 120.5),
+    ("12,5", 12.5),
+    ("350", 350.0),
+    ("1.299.00", None),
+    ("do negocjacji", None),
+    ("", None),
+]
+
+
+def derived(prices):
+    rows = [make_row(i, cena=cena) for i, cena in enumerate(prices)]
+    return core.add_derived_columns(pd.DataFrame(rows, columns=core.COLUMNS, dtype=str))
+
+
+@pytest.mark.parametrize("cena, expected", PRICES)
+def test_cena_num(cena, expected):
+    value = derived([cena])["cena_num"].iloc[0]
+    assert math.isnan(value) if expected is None else value == expected
+
+
+def test_cena_num_matches_parse_price():
+    values = derived([cena for cena, _ in PRICES])["cena_num"].tolist()
+    for (cena, _), value in zip(PRICES, values):
+        parsed = core.parse_price(cena)
+        assert (parsed is None) == math.isnan(value)
+        if parsed is not None:
+            assert parsed == core.parse_price(str(value))
+
+
+@pytest.mark.parametrize("storage", ["csv", "journal", "sqlite", "arrow"], indirect=True)
+def test_sales_stats_sum_thousands(storage):
+    core.insert_rows([make_row(1, cena="1.299,00 zł"), make_row(2, cena="ok. 50 zł")])
+    stats_df, _ = core.sales_stats("Miesiąc")
+    assert stats_df["Razem zł"].tolist() == [1349.0]
@@ -0,0 +1,147 @@
+# 🏷️ KOLEJKA UZUPEŁNIANIA - zadanie -> wątek -> update_fields na stronach z lokalnego serwera testowego
+#
+#   python -m pytest tests/test_enrichment.py
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from conftest import core, make_row
+
+OFFER_PAGE = """<html><body>
+<h1>Lusterko Skoda Fabia II lewe 5J0857507</h1>
+<span class="price" itemprop="price" content="99.90">99,90 zł</span>
+</body></html>"""
+OFFER_PATH = "/lusterko-5j0857507-nr111"
+
+
+@pytest.fixture
+def offer_server(storage, monkeypatch):
+    # pages: ścieżka -> lista odpowiedzi (status, treść) wydawanych po kolei, ostatnia powtarzana; brak -> 404
+    pages, hits = {}, []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(self.path)
+            responses = pages.get(self.path, [(404, "")])
+            status, body = responses.pop(0) if len(responses) > 1 else responses[0]
+            body = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(core, "SPRZEDAJEMY_OFFER_URL", f"http://127.0.0.1:{server.server_address[1]}")
+    # ✅ KAŻDE POBRANIE IDZIE DO SERWERA - bez cache HTTP i bez ponowień z odstępem wewnątrz http_get
+    monkeypatch.setattr(core, "HTTP_CACHE_ENABLED", False)
+    monkeypatch.setattr(core, "HTTP_RETRIES", 0)
+    monkeypatch.setattr(core, "ENRICH_RETRY_BASE", 0.05)
+    core.get_circuit_breaker.clear()
+    yield pages, hits
+    server.shutdown()
+    server.server_close()
+    core.get_circuit_breaker.clear()
+
+
+def offer_row(**fields):
+    return make_row(1, link=f"https://sprzedajemy.pl{OFFER_PATH}", cena="", **fields)
+
+
+def new_queue():
+    return core.EnrichmentQueue(core.ENRICH_DB_PATH, 2, 100.0)
+
+
+def job(enrichment, row_id="manual-1"):
+    return enrichment._conn.execute("SELECT status, attempts, error FROM jobs WHERE id = ?", (row_id,)).fetchone()
+
+
+def row_fields(row_id="manual-1"):
+    return core.read_all().set_index("id").loc[row_id, ["cena", "opis"]].tolist()
+
+
+@pytest.mark.parametrize("storage", ["csv", "journal", "sqlite", "arrow"], indirect=True)
+def test_submit_fills_price(offer_server):
+    pages, _ = offer_server
+    pages[OFFER_PATH] = [(200, OFFER_PAGE)]
+    core.insert_rows([offer_row(), make_row(2)])
+    enrichment = new_queue()
+    # ✅ WIERSZ BEZ LINKU DO OFERTY - bez zadania
+    assert enrichment.submit([offer_row(), make_row(2)]) == 1
+    enrichment.start()
+    assert enrichment.wait(10)
+    assert job(enrichment) == ("done", 1, None)
+    assert row_fields() == ["99,90 zł", "Lusterko Skoda Fabia II lewe 5J0857507"]
+
+
+def test_pending_jobs_resume_after_restart(offer_server):
+    pages, _ = offer_server
+    pages[OFFER_PATH] = [(200, OFFER_PAGE)]
+    core.insert_rows([offer_row()])
+    # ✅ PROCES ZAMKNIĘTY PRZED POBRANIEM - zadanie zostaje w bazie zadań jako "pending"
+    new_queue().submit([offer_row()])
+    enrichment = new_queue()
+    enrichment.start()
+    assert enrichment.wait(10)
+    assert job(enrichment) == ("done", 1, None)
+    assert row_fields()[0] == "99,90 zł"
+
+
+def test_server_error_retried(offer_server):
+    pages, hits = offer_server
+    pages[OFFER_PATH] = [(503, ""), (200, OFFER_PAGE)]
+    core.insert_rows([offer_row()])
+    enrichment = new_queue()
+    enrichment.submit([offer_row()])
+    enrichment.start()
+    assert enrichment.wait(10)
+    assert job(enrichment) == ("done", 2, None)
+    assert hits == [OFFER_PATH, OFFER_PATH]
+    assert row_fields()[0] == "99,90 zł"
+
+
+def test_server_error_fails_after_max_attempts(offer_server, monkeypatch):
+    pages, hits = offer_server
+    monkeypatch.setattr(core, "ENRICH_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(core, "BREAKER_FAILURES", 10)
+    pages[OFFER_PATH] = [(503, "")]
+    core.insert_rows([offer_row()])
+    enrichment = new_queue()
+    enrichment.submit([offer_row()])
+    enrichment.start()
+    assert enrichment.wait(10)
+    status, attempts, _ = job(enrichment)
+    assert (status, attempts, len(hits)) == ("failed", 3, 3)
+    assert row_fields()[0] == ""
+
+
+def test_missing_offer_fails_without_retry(offer_server):
+    _, hits = offer_server
+    core.insert_rows([offer_row()])
+    enrichment = new_queue()
+    enrichment.submit([offer_row()])
+    enrichment.start()
+    assert enrichment.wait(10)
+    assert job(enrichment) == ("failed", 1, "brak ceny na stronie oferty")
+    assert hits == [OFFER_PATH]
+    assert row_fields() == ["", ""]
+
+
+@pytest.mark.parametrize("storage", ["csv", "journal", "sqlite", "arrow"], indirect=True)
+def test_user_edit_not_overwritten(offer_server):
+    pages, _ = offer_server
+    pages[OFFER_PATH] = [(200, OFFER_PAGE)]
+    core.insert_rows([offer_row()])
+    enrichment = new_queue()
+    enrichment.submit([offer_row()])
+    # ✅ CENA WPISANA RĘCZNIE PO DODANIU, ZANIM STRONA OFERTY ZOSTAŁA POBRANA
+    core.update_field("manual-1", "cena", "120 zł")
+    enrichment.start()
+    assert enrichment.wait(10)
+    assert job(enrichment) == ("done", 1, "pominięto: cena")
+    assert row_fields() == ["120 zł", "Lusterko Skoda Fabia II lewe 5J0857507"]
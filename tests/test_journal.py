@@ -0,0 +1,22 @@
+# 📒 DZIENNIK ZMIAN - wpisy nakładane na ramkę z cache nie zmieniają jej samej
+#
+#   python -m pytest tests/test_journal.py
+import pandas as pd
+
+from conftest import core, make_row
+
+
+def test_apply_journal_records_leaves_cached_frame():
+    cached = core.add_derived_columns(pd.DataFrame([make_row(i) for i in range(5)], columns=core.COLUMNS, dtype=str))
+    before = cached.copy(deep=True)
+    records = [
+        {"op": "update", "id": "manual-1", "column": "notatka", "value": "nowa"},
+        {"op": "update", "id": "manual-2", "column": "tytul", "value": "1K0807221"},
+        {"op": "update", "id": "manual-3", "column": "cena", "value": "1.299,00 zł"},
+    ]
+    df = core.apply_journal_records(cached, records)
+    pd.testing.assert_frame_equal(cached, before)
+    row = df.set_index("id")
+    assert row.loc["manual-1", "notatka"] == "nowa"
+    assert row.loc["manual-2", "part_key"] == "1K0807221"
+    assert row.loc["manual-3", "cena_num"] == 1299.0
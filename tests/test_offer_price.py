@@ -0,0 +1,79 @@
+# 🏷️ CENA ZE STRONY OFERTY - parse_price i extract_offer_details na stronie z lokalnego serwera testowego
+#
+#   python -m pytest tests/test_offer_price.py
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import oscar_core as core  # noqa: E402
+
+# ✅ STRONA OFERTY W UKŁADZIE SERWISU - kwota maszynowa w atrybucie, tekst z separatorem tysięcy
+OFFER_PAGE = """<!DOCTYPE html>
+<html lang="pl"><head>
+<meta property="og:title" content="Lusterko Skoda Fabia II lewe 5J0857507">
+</head><body>
+<h1>Lusterko Skoda Fabia II lewe 5J0857507</h1>
+<span class="price" itemprop="price" content="%(amount)s">%(text)s</span>
+</body></html>"""
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1.299,00 zł", "1299 zł"),
+    ("1 299,99 zł", "1299,99 zł"),
+    ("1\xa0299,99 zł", "1299,99 zł"),
+    ("1,299.00", "1299 zł"),
+    ("1299.99", "1299,99 zł"),
+    ("120.00", "120 zł"),
+    ("1,29 zł", "1,29 zł"),
+    ("1.299 zł", "1299 zł"),
+    ("1 234 567,89 zł", "1234567,89 zł"),
+])
+def test_parse_price(text, expected):
+    assert core.parse_price(text) == expected
+
+
+@pytest.mark.parametrize("text", ["1.299.00", "1,2345", "cena do negocjacji", "", None])
+def test_parse_price_rejects_ambiguous(text):
+    assert core.parse_price(text) is None
+
+
+@pytest.fixture
+def offer_server():
+    pages = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = pages.get(self.path, "").encode("utf-8")
+            self.send_response(200 if body else 404)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", pages
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("amount, text, expected", [
+    ("1299.00", "1.299,00 zł", "1299 zł"),
+    ("", "1.299,00 zł", "1299 zł"),
+    ("", "1 299,99 zł", "1299,99 zł"),
+    ("99.90", "99,90 zł", "99,90 zł"),
+])
+def test_offer_page_price(offer_server, amount, text, expected):
+    url, pages = offer_server
+    pages["/lusterko-nr111"] = OFFER_PAGE % {"amount": amount, "text": text}
+    html = core.http_get(url + "/lusterko-nr111").text
+    assert core.extract_offer_details(html) == ("Lusterko Skoda Fabia II lewe 5J0857507", expected)
@@ -0,0 +1,47 @@
+# 🧪 ZGODNOŚĆ PARSERÓW - szybki parser (HTMLParser) kontra wersja referencyjna BeautifulSoup
+# na zapisanych stronach wyników sprzedajemy.pl z bench_pages/
+#
+#   python -m pytest tests/test_parser_parity.py
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES_DIR = os.path.join(REPO_DIR, "bench_pages")
+sys.path.insert(0, REPO_DIR)
+
+import oscar_core as core  # noqa: E402
+
+# ✅ LICZBA OFERT NA STRONIE - zmiana parsera nie może po cichu zgubić linków
+EXPECTED_OFFERS = {
+    "szukaj_5J0857507_numer.html": 1,
+    "szukaj_brak_wynikow.html": 0,
+    "szukaj_lusterko_fabia.html": 30,
+    "szukaj_octavia_popsute_linki.html": 25,
+}
+PAGES = sorted(name for name in os.listdir(PAGES_DIR) if name.endswith(".html"))
+
+
+def read_page(name):
+    with open(os.path.join(PAGES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("name", PAGES)
+def test_fast_parser_matches_bs4(name):
+    html = read_page(name)
+    assert core.extract_ids_and_links(html) == core.extract_ids_and_links_bs4(html)
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED_OFFERS))
+def test_offer_count(name):
+    ids, urls = core.extract_ids_and_links(read_page(name))
+    assert len(ids) == len(urls) == EXPECTED_OFFERS[name]
+    assert all(offer_id.isdigit() for offer_id in ids)
+
+
+def test_broken_hrefs_are_repaired():
+    _, urls = core.extract_ids_and_links(read_page("szukaj_octavia_popsute_linki.html"))
+    assert all(url.startswith("https://sprzedajemy.pl/") for url in urls)
+    assert not any("httpshttps" in url or "https//" in url or "plhttps" in url for url in urls)
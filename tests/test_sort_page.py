@@ -0,0 +1,45 @@
+# 📄 STRONA PANELU SPRZEDANYCH - kolejność liczona raz na wersję ramki, odświeżenie tnie tylko stronę
+#
+#   python -m pytest tests/test_sort_page.py
+import pytest
+
+from conftest import core, make_row
+
+PAGE = 7
+
+
+def rows(count):
+    return [make_row(i, tytul=f"{(i * 37) % 11} 5J0857507", dodano=f"2024-0{i % 9 + 1}-0{i % 3 + 1} 10:00")
+            for i in range(count)]
+
+
+def expected_ids(sort_option):
+    column, ascending = core.SORT_OPTIONS[sort_option]
+    column = "dodano_dt" if column == "dodano" else column
+    return core.load_data().sort_values(column, ascending=ascending, kind="stable")["id"].tolist()
+
+
+def paged_ids(sort_option, count):
+    return [row_id for offset in range(0, count, PAGE)
+            for row_id in core.load_sorted(sort_option, limit=PAGE, offset=offset)["id"]]
+
+
+@pytest.mark.parametrize("storage", ["csv", "journal"], indirect=True)
+@pytest.mark.parametrize("sort_option", list(core.SORT_OPTIONS))
+def test_pages_follow_sort_after_changes(storage, sort_option):
+    core.insert_rows(rows(30))
+    assert paged_ids(sort_option, 30) == expected_ids(sort_option)
+    # ✅ NOWA WERSJA RAMKI - zapamiętana kolejność nie może zostać ze starej
+    core.update_field("manual-3", "dodano", "2030-01-01 10:00")
+    core.update_field("manual-4", "tytul", "00 pierwszy")
+    core.delete_row("manual-5")
+    core.insert_rows([make_row(99, dodano="2031-01-01 10:00")])
+    assert paged_ids(sort_option, 30) == expected_ids(sort_option)
+
+
+@pytest.mark.parametrize("storage", ["csv", "journal"], indirect=True)
+def test_sort_order_cached_per_frame(storage):
+    core.insert_rows(rows(10))
+    df = core.load_data()
+    cache = core.get_data_cache()
+    assert cache.sort_order(df, "dodano_dt", False) is cache.sort_order(df, "dodano_dt", False)
@@ -0,0 +1,28 @@
+# 🚀 MIGRACJE TRYBU ZAPISU - pierwsze wczytanie po zmianie trybu nie blokuje się z zapisującym
+#
+#   python -m pytest tests/test_storage_migration.py
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from conftest import core, make_row
+
+
+@pytest.mark.parametrize("storage", ["sqlite", "arrow"], indirect=True)
+def test_first_load_with_writer_holding_storage_lock(storage):
+    # ✅ BAZA Z TRYBU CSV - pierwsze wczytanie w trybie sqlite / arrow robi migrację
+    pd.DataFrame([make_row(i) for i in range(5)], columns=core.COLUMNS).to_csv(core.CSV_PATH, index=False)
+    loader = threading.Thread(target=core.load_data, daemon=True)
+    # ✅ ZAPISUJĄCY: storage_lock(), a potem blokada cache (invalidate_data)
+    with core.storage_lock():
+        loader.start()
+        time.sleep(0.2)
+        writer = threading.Thread(target=core.invalidate_data, daemon=True)
+        writer.start()
+        writer.join(5)
+        assert not writer.is_alive()
+    loader.join(10)
+    assert not loader.is_alive()
+    assert core.load_data()["id"].tolist() == [f"manual-{i}" for i in range(5)]
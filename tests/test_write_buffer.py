@@ -0,0 +1,55 @@
+# ✏️ BUFOR ZAPISU - edycje, licznik i konflikty należą do sesji, która je zrobiła
+#
+#   python -m pytest tests/test_write_buffer.py
+import pytest
+
+from conftest import core, make_row
+
+STORAGE_MODES = ["csv", "journal", "sqlite", "arrow"]
+
+
+def note(row_id):
+    return core.load_data().set_index("id").loc[row_id, "notatka"]
+
+
+@pytest.mark.parametrize("storage", STORAGE_MODES, indirect=True)
+def test_pending_edits_belong_to_session(storage):
+    core.insert_rows([make_row(1), make_row(2)])
+    buffer = core.get_write_buffer()
+    buffer.add("manual-1", "notatka", "od A", "", session="A")
+    buffer.add("manual-2", "notatka", "od B", "", session="B")
+    assert buffer.pending_count("A") == buffer.pending_count("B") == 1
+    # ✅ "ZAPISZ" SESJI A NIE ZAPISUJE EDYCJI SESJI B
+    assert buffer.flush("A") == 1
+    assert (note("manual-1"), note("manual-2")) == ("od A", "")
+    assert buffer.pending_count("A") == 0 and buffer.pending_count("B") == 1
+    assert buffer.flush() == 1
+    assert note("manual-2") == "od B"
+
+
+@pytest.mark.parametrize("storage", STORAGE_MODES, indirect=True)
+def test_conflict_goes_to_rejected_session(storage):
+    core.insert_rows([make_row(1)])
+    buffer = core.get_write_buffer()
+    buffer.add("manual-1", "notatka", "od A", "", session="A")
+    # ✅ SESJA B WIDZIAŁA STARĄ WARTOŚĆ - odrzucona zmiana B trafia tylko do B
+    buffer.add("manual-1", "notatka", "od B", "", session="B")
+    assert buffer.pop_conflicts("A") == []
+    assert buffer.pop_conflicts("B") == [{"id": "manual-1", "column": "notatka", "value": "od B", "current": "od A"}]
+    assert buffer.pop_conflicts("B") == []
+    buffer.flush()
+    assert note("manual-1") == "od A"
+
+
+@pytest.mark.parametrize("storage", STORAGE_MODES, indirect=True)
+def test_flush_conflict_goes_to_owner(storage):
+    core.insert_rows([make_row(1), make_row(2)])
+    buffer = core.get_write_buffer()
+    buffer.add("manual-1", "notatka", "od A", "", session="A")
+    buffer.add("manual-2", "notatka", "od B", "", session="B")
+    core.delete_row("manual-1")
+    # ✅ ZAPIS Z TIMERA (wszystkie sesje) - konflikt usuniętego wiersza dostaje sesja A
+    buffer.flush()
+    assert buffer.pop_conflicts("B") == []
+    assert [conflict["id"] for conflict in buffer.pop_conflicts("A")] == ["manual-1"]
+    assert note("manual-2") == "od B"